@@ -2,7 +2,8 @@ from logging.config import fileConfig
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 from alembic import context
-from database import Base  # Import your SQLAlchemy Base
+from database import Base, DATABASE_URL, get_connect_args  # Import your SQLAlchemy Base
+import app.models  # noqa: F401 - registers every table on Base.metadata
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -12,10 +13,22 @@ config = context.config
 # This line sets up loggers basically.
 fileConfig(config.config_file_name)
 
+# Prefer the application's DATABASE_URL over the placeholder in alembic.ini
+if DATABASE_URL:
+    config.set_main_option("sqlalchemy.url", DATABASE_URL.replace("%", "%%"))
+
 # add your model's MetaData object here
 # for 'autogenerate' support
 target_metadata = Base.metadata
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    # The full-text index and FTS5 tables are created by raw DDL, not the models
+    if reflected and name and name.startswith(("products_fts", "ix_products_search")):
+        return False
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
     
@@ -31,6 +44,7 @@ def run_migrations_offline():
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -48,12 +62,14 @@ def run_migrations_online():
         config.get_section(config.config_ini_section),
         prefix='sqlalchemy.',
         poolclass=pool.NullPool,
+        connect_args=get_connect_args(config.get_main_option("sqlalchemy.url")),
     )
 
     with connectable.connect() as connection:
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,92 @@
+"""initial schema
+
+Baseline matching the tables previously created by ``create_tables()``.
+Databases created that way should be stamped with ``alembic stamp 0001``
+before running ``alembic upgrade head``.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("email", sa.String(length=255), nullable=False),
+        sa.Column("password", sa.String(length=255), nullable=False),
+        sa.Column("phone", sa.String(length=255), nullable=True),
+        sa.Column("address", sa.String(length=255), nullable=True),
+        sa.Column("recent_order", sa.String(length=255), nullable=True),
+        sa.Column("my_plants", sa.JSON(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("email"),
+    )
+    op.create_table(
+        "products",
+        sa.Column("id", sa.String(length=255), nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("price", sa.Float(), nullable=False),
+        sa.Column("description", sa.String(length=255), nullable=True),
+        sa.Column("stock", sa.Integer(), nullable=True),
+        sa.Column("type", sa.String(length=255), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "plants",
+        sa.Column("id", sa.String(length=255), nullable=False),
+        sa.Column("category", sa.String(length=255), nullable=False),
+        sa.Column("water", sa.String(length=255), nullable=False),
+        sa.Column("light", sa.String(length=255), nullable=False),
+        sa.Column("soil_type", sa.String(length=255), nullable=False),
+        sa.Column("size", sa.String(length=255), nullable=False),
+        sa.ForeignKeyConstraint(["id"], ["products.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "accessories",
+        sa.Column("id", sa.String(length=255), nullable=False),
+        sa.Column("size", sa.String(length=255), nullable=False),
+        sa.Column("color", sa.String(length=255), nullable=False),
+        sa.ForeignKeyConstraint(["id"], ["products.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "plant_guides",
+        sa.Column("id", sa.String(length=255), nullable=False),
+        sa.Column("how_to_plant", sa.JSON(), nullable=False),
+        sa.Column("care_guide", sa.JSON(), nullable=False),
+        sa.ForeignKeyConstraint(["id"], ["plants.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "orders",
+        sa.Column("id", sa.String(length=255), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("products", sa.String(length=255), nullable=False),
+        sa.Column("total_price", sa.Float(), nullable=False),
+        sa.Column("transac_id", sa.String(length=255), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade():
+    op.drop_table("orders")
+    op.drop_table("plant_guides")
+    op.drop_table("accessories")
+    op.drop_table("plants")
+    op.drop_table("products")
+    op.drop_table("users")
@@ -0,0 +1,54 @@
+"""indexes for filtered and joined columns
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Product names are looked up on every create; fails if duplicates exist
+    op.create_index("ix_products_name", "products", ["name"], unique=True)
+    op.create_index("ix_products_stock", "products", ["stock"])
+    op.create_index("ix_products_price", "products", ["price"])
+    op.create_index("ix_products_type_stock", "products", ["type", "stock"])
+    op.create_index("ix_products_type_price", "products", ["type", "price"])
+
+    op.create_index("ix_plants_category", "plants", ["category"])
+    op.create_index("ix_plants_water", "plants", ["water"])
+    op.create_index("ix_plants_light", "plants", ["light"])
+    op.create_index("ix_plants_size", "plants", ["size"])
+
+    op.create_index("ix_accessories_size", "accessories", ["size"])
+    op.create_index("ix_accessories_color", "accessories", ["color"])
+
+    op.create_index("ix_orders_user_id", "orders", ["user_id"])
+    op.create_index("ix_orders_transac_id", "orders", ["transac_id"])
+
+
+def downgrade():
+    op.drop_index("ix_orders_transac_id", table_name="orders")
+    op.drop_index("ix_orders_user_id", table_name="orders")
+
+    op.drop_index("ix_accessories_color", table_name="accessories")
+    op.drop_index("ix_accessories_size", table_name="accessories")
+
+    op.drop_index("ix_plants_size", table_name="plants")
+    op.drop_index("ix_plants_light", table_name="plants")
+    op.drop_index("ix_plants_water", table_name="plants")
+    op.drop_index("ix_plants_category", table_name="plants")
+
+    op.drop_index("ix_products_type_price", table_name="products")
+    op.drop_index("ix_products_type_stock", table_name="products")
+    op.drop_index("ix_products_price", table_name="products")
+    op.drop_index("ix_products_stock", table_name="products")
+    op.drop_index("ix_products_name", table_name="products")
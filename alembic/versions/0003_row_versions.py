@@ -0,0 +1,40 @@
+"""row version and updated_at on catalog tables
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+CATALOG_TABLES = ("products", "plants", "plant_guides", "accessories")
+
+
+def upgrade():
+    for table in CATALOG_TABLES:
+        op.add_column(
+            table,
+            sa.Column("version", sa.Integer(), nullable=False, server_default="1"),
+        )
+        # SQLite can't add a column with a non-constant default, so backfill
+        op.add_column(table, sa.Column("updated_at", sa.DateTime(), nullable=True))
+        op.execute(f"UPDATE {table} SET updated_at = CURRENT_TIMESTAMP")
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(
+                "updated_at", existing_type=sa.DateTime(), nullable=False
+            )
+
+
+def downgrade():
+    for table in reversed(CATALOG_TABLES):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("updated_at")
+            batch_op.drop_column("version")
@@ -0,0 +1,59 @@
+"""normalized order items and order timestamps
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "order_items",
+        sa.Column("order_id", sa.String(length=255), nullable=False),
+        sa.Column("product_id", sa.String(length=255), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("unit_price", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["order_id"], ["orders.id"]),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"]),
+        sa.PrimaryKeyConstraint("order_id", "product_id"),
+    )
+    op.create_index("ix_order_items_product_id", "order_items", ["product_id"])
+
+    # Backfilled the same way as updated_at in 0003
+    op.add_column("orders", sa.Column("created_at", sa.DateTime(), nullable=True))
+    op.execute("UPDATE orders SET created_at = CURRENT_TIMESTAMP")
+
+    # The composite index serves the user_id foreign key, so create it first
+    op.create_index("ix_orders_user_id_created_at", "orders", ["user_id", "created_at"])
+    op.drop_index("ix_orders_user_id", table_name="orders")
+
+    with op.batch_alter_table("orders") as batch_op:
+        batch_op.alter_column("created_at", existing_type=sa.DateTime(), nullable=False)
+        batch_op.alter_column(
+            "products", existing_type=sa.String(length=255), nullable=True
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("orders") as batch_op:
+        batch_op.alter_column(
+            "products", existing_type=sa.String(length=255), nullable=False
+        )
+
+    op.create_index("ix_orders_user_id", "orders", ["user_id"])
+    op.drop_index("ix_orders_user_id_created_at", table_name="orders")
+    with op.batch_alter_table("orders") as batch_op:
+        batch_op.drop_column("created_at")
+
+    op.drop_index("ix_order_items_product_id", table_name="order_items")
+    op.drop_table("order_items")
@@ -0,0 +1,40 @@
+"""per-user order summaries
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "user_order_summaries",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("order_count", sa.Integer(), nullable=False),
+        sa.Column("total_spent", sa.Float(), nullable=False),
+        sa.Column("last_order_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+
+    # Seed from existing history so summaries are complete from day one
+    op.execute(
+        "INSERT INTO user_order_summaries "
+        "(user_id, order_count, total_spent, last_order_at) "
+        "SELECT user_id, COUNT(*), SUM(total_price), MAX(created_at) "
+        "FROM orders GROUP BY user_id"
+    )
+
+
+def downgrade():
+    op.drop_table("user_order_summaries")
@@ -0,0 +1,173 @@
+"""full-text search over products
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+# Frozen copies of the tables and the index DDL as of this revision, so later
+# changes to the application models can't change what this migration does
+products = sa.table(
+    "products",
+    sa.column("id", sa.String),
+    sa.column("name", sa.String),
+    sa.column("description", sa.String),
+    sa.column("search_text", sa.Text),
+)
+plants = sa.table(
+    "plants",
+    sa.column("id", sa.String),
+    sa.column("category", sa.String),
+    sa.column("water", sa.String),
+    sa.column("light", sa.String),
+    sa.column("soil_type", sa.String),
+    sa.column("size", sa.String),
+)
+plant_guides = sa.table(
+    "plant_guides",
+    sa.column("id", sa.String),
+    sa.column("how_to_plant", sa.JSON),
+    sa.column("care_guide", sa.JSON),
+)
+accessories = sa.table(
+    "accessories",
+    sa.column("id", sa.String),
+    sa.column("size", sa.String),
+    sa.column("color", sa.String),
+)
+
+SEARCH_INDEX_DDL = {
+    "postgresql": [
+        "CREATE INDEX ix_products_search_text ON products "
+        "USING gin (to_tsvector('english', coalesce(search_text, '')))",
+    ],
+    "mysql": [
+        "CREATE FULLTEXT INDEX ix_products_search_text ON products (search_text)",
+    ],
+    "sqlite": [
+        "CREATE VIRTUAL TABLE products_fts USING fts5(product_id UNINDEXED, search_text)",
+        "CREATE TRIGGER products_fts_insert AFTER INSERT ON products BEGIN "
+        "INSERT INTO products_fts (product_id, search_text) "
+        "VALUES (new.id, new.search_text); END",
+        "CREATE TRIGGER products_fts_update AFTER UPDATE OF search_text ON products "
+        "BEGIN DELETE FROM products_fts WHERE product_id = old.id; "
+        "INSERT INTO products_fts (product_id, search_text) "
+        "VALUES (new.id, new.search_text); END",
+        "CREATE TRIGGER products_fts_delete AFTER DELETE ON products BEGIN "
+        "DELETE FROM products_fts WHERE product_id = old.id; END",
+    ],
+}
+
+
+def _document_strings(document):
+    if isinstance(document, dict):
+        for key, value in document.items():
+            yield str(key).replace("_", " ")
+            yield from _document_strings(value)
+    elif isinstance(document, list):
+        for value in document:
+            yield from _document_strings(value)
+    elif isinstance(document, str):
+        yield document
+
+
+def _search_text(row):
+    parts = [
+        value
+        for value in (
+            row.name,
+            row.description,
+            row.category,
+            row.water,
+            row.light,
+            row.soil_type,
+            row.plant_size,
+            row.accessory_size,
+            row.color,
+        )
+        if value
+    ]
+    for document in (row.how_to_plant, row.care_guide):
+        parts.extend(_document_strings(document))
+    return " ".join(parts)
+
+
+def _search_rows(after, limit):
+    query = (
+        sa.select(
+            products.c.id,
+            products.c.name,
+            products.c.description,
+            plants.c.category,
+            plants.c.water,
+            plants.c.light,
+            plants.c.soil_type,
+            plants.c.size.label("plant_size"),
+            plant_guides.c.how_to_plant,
+            plant_guides.c.care_guide,
+            accessories.c.size.label("accessory_size"),
+            accessories.c.color,
+        )
+        .outerjoin(plants, plants.c.id == products.c.id)
+        .outerjoin(plant_guides, plant_guides.c.id == plants.c.id)
+        .outerjoin(accessories, accessories.c.id == products.c.id)
+        .order_by(products.c.id)
+        .limit(limit)
+    )
+    if after is not None:
+        query = query.where(products.c.id > after)
+    return query
+
+
+def upgrade():
+    op.add_column("products", sa.Column("search_text", sa.Text(), nullable=True))
+
+    # Guide text lives in JSON documents, so search_text is built in Python,
+    # one keyset page of products at a time
+    bind = op.get_bind()
+    after = None
+    while True:
+        rows = bind.execute(_search_rows(after, BACKFILL_BATCH_SIZE)).all()
+        if not rows:
+            break
+        bind.execute(
+            products.update()
+            .where(products.c.id == sa.bindparam("product_id"))
+            .values(search_text=sa.bindparam("text")),
+            [{"product_id": row.id, "text": _search_text(row)} for row in rows],
+        )
+        after = rows[-1].id
+
+    for statement in SEARCH_INDEX_DDL.get(bind.dialect.name, []):
+        op.execute(statement)
+
+    if bind.dialect.name == "sqlite":
+        op.execute(
+            "INSERT INTO products_fts (product_id, search_text) "
+            "SELECT id, search_text FROM products"
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        for trigger in ("insert", "update", "delete"):
+            op.execute(f"DROP TRIGGER IF EXISTS products_fts_{trigger}")
+        op.execute("DROP TABLE IF EXISTS products_fts")
+    elif dialect in SEARCH_INDEX_DDL:
+        op.drop_index("ix_products_search_text", table_name="products")
+
+    with op.batch_alter_table("products") as batch_op:
+        batch_op.drop_column("search_text")
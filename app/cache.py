@@ -0,0 +1,304 @@
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Iterable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, stay per-process
+    fcntl = None
+
+
+class TTLCache:
+    """In-process LRU cache whose entries also expire after ``ttl`` seconds
+
+    ``max_bytes`` optionally caps the summed ``size`` passed to ``set``.
+    """
+
+    def __init__(
+        self, maxsize: int = 1024, ttl: float = 60.0, max_bytes: Optional[int] = None
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value, _ = entry
+        if expires_at < time.monotonic():
+            self.invalidate(key)
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, size: int = 0):
+        if not self.enabled:
+            return
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        self.invalidate(key)
+        self._data[key] = (time.monotonic() + self.ttl, value, size)
+        self.bytes += size
+        while len(self._data) > self.maxsize or (
+            self.max_bytes is not None and self.bytes > self.max_bytes
+        ):
+            _, (_, _, evicted_size) = self._data.popitem(last=False)
+            self.bytes -= evicted_size
+
+    def invalidate(self, key: Hashable):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def clear(self):
+        self._data.clear()
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SharedGeneration:
+    """Counters shared by every worker process on this host through an mmap'd file
+
+    Workers compare them on each read, so bumping one invalidates all of them
+    without any network round-trip. ``slots`` > 1 gives one counter per slot
+    (see ``slot``) so a single key can be invalidated. Falls back to
+    per-process counters when the file can't be mapped.
+    """
+
+    _FORMAT = "Q"
+
+    def __init__(self, path: Optional[str], slots: int = 1):
+        self.slots = slots
+        self._local = [0] * slots
+        self._fd = None
+        self._map = None
+        if fcntl is None or not path:
+            return
+
+        try:
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            size = struct.calcsize(self._FORMAT) * slots
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+            self._map = mmap.mmap(self._fd, size)
+        except OSError:
+            if self._fd is not None:
+                os.close(self._fd)
+            self._fd = None
+
+    @property
+    def shared(self) -> bool:
+        return self._map is not None
+
+    def slot(self, key: Hashable) -> int:
+        # crc32 rather than hash(): str hashes differ between processes
+        return zlib.crc32(str(key).encode("utf-8")) % self.slots
+
+    def current(self, slot: int = 0) -> int:
+        if self._map is None:
+            return self._local[slot]
+        offset = slot * struct.calcsize(self._FORMAT)
+        return struct.unpack_from(self._FORMAT, self._map, offset)[0]
+
+    def bump(self, slot: int = 0) -> int:
+        if self._map is None:
+            self._local[slot] += 1
+            return self._local[slot]
+
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            value = self.current(slot) + 1
+            offset = slot * struct.calcsize(self._FORMAT)
+            struct.pack_into(self._FORMAT, self._map, offset, value)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return value
+
+
+class KeyedCache:
+    """TTLCache of single rows, invalidated one key at a time across workers
+
+    Each entry is stamped with its key's slot generation when it is loaded;
+    ``invalidate`` bumps that slot, so every worker treats the entry as
+    missing on its next read. Keys sharing a slot only cost an extra miss.
+    """
+
+    def __init__(self, entries: TTLCache, generations: SharedGeneration):
+        self.entries = entries
+        self.generations = generations
+
+    def generation(self, key: Hashable) -> int:
+        """Read before loading a value, then pass to ``set``"""
+        return self.generations.current(self.generations.slot(key))
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        generation, value = entry
+        if generation != self.generation(key):
+            self.entries.invalidate(key)
+            return None
+        return value
+
+    def set(self, key: Hashable, value: Any, generation: int):
+        # A write between loading and here leaves the entry already stale
+        self.entries.set(key, (generation, value))
+
+    def invalidate(self, key: Hashable):
+        self.entries.invalidate(key)
+        self.generations.bump(self.generations.slot(key))
+
+
+def _row_ids(value: Any):
+    """Ids of the catalog rows (dicts with an id and a version) in a payload"""
+    if isinstance(value, dict):
+        if "id" in value and "version" in value:
+            yield value["id"]
+        for nested in value.values():
+            if isinstance(nested, (dict, list)):
+                yield from _row_ids(nested)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _row_ids(item)
+
+
+class CatalogCache:
+    """Read-through cache for catalog payloads, invalidated across workers
+
+    Any catalog write bumps the shared generation; each worker drops its local
+    entries the next time it sees a different generation. Writes that only
+    change existing rows' stock use ``invalidate_rows`` instead, which bumps
+    those rows' slots in ``row_generations``: entries are stamped with the
+    slots of the rows they contain and are only dropped when one of them moves.
+    """
+
+    # Slot 0 of row_generations counts every row invalidation
+    _ANY_ROW = 0
+
+    def __init__(
+        self,
+        entries: TTLCache,
+        generation: SharedGeneration,
+        row_generations: SharedGeneration,
+    ):
+        self.entries = entries
+        self.generation = generation
+        self.row_generations = row_generations
+        self._seen_generation = generation.current()
+
+    def _row_slot(self, row_id: Any) -> int:
+        return 1 + self.row_generations.slot(row_id) % (self.row_generations.slots - 1)
+
+    def _row_stamp(self, value: Any) -> tuple:
+        slots = {self._row_slot(row_id) for row_id in _row_ids(value)}
+        return tuple((slot, self.row_generations.current(slot)) for slot in slots)
+
+    def _sync(self) -> int:
+        current = self.generation.current()
+        if current != self._seen_generation:
+            self.entries.clear()
+            self._seen_generation = current
+        return current
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        self._sync()
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, stamp = entry
+        if any(self.row_generations.current(slot) != gen for slot, gen in stamp):
+            self.entries.invalidate(key)
+            return None
+        return value
+
+    async def get_or_load(
+        self, key: Hashable, loader: Callable[[], Awaitable[Optional[Any]]]
+    ) -> Optional[Any]:
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        generation = self.generation.current()
+        any_row = self.row_generations.current(self._ANY_ROW)
+        value = await loader()
+        # Don't cache a value that a concurrent write may already have outdated
+        if (
+            value is not None
+            and self.generation.current() == generation
+            and self.row_generations.current(self._ANY_ROW) == any_row
+        ):
+            size = len(json.dumps(value, default=str))
+            self.entries.set(key, (value, self._row_stamp(value)), size=size)
+        return value
+
+    def invalidate(self):
+        self.entries.clear()
+        self._seen_generation = self.generation.bump()
+
+    def invalidate_rows(self, row_ids: Iterable[Any]):
+        """Drop, in every worker, only the entries containing these rows
+
+        For changes that can't add a row to or remove one from any cached
+        query other than by changing a row it already contains.
+        """
+        for slot in {self._row_slot(row_id) for row_id in row_ids}:
+            self.row_generations.bump(slot)
+        self.row_generations.bump(self._ANY_ROW)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "bytes": self.entries.bytes,
+            "max_bytes": self.entries.max_bytes,
+            "hits": self.entries.hits,
+            "misses": self.entries.misses,
+            "generation": self._seen_generation,
+            "row_invalidations": self.row_generations.current(self._ANY_ROW),
+            "shared_generation": self.generation.shared,
+        }
+
+
+catalog_cache = CatalogCache(
+    TTLCache(
+        maxsize=int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "10000")),
+        ttl=float(os.getenv("CATALOG_CACHE_TTL", "300")),
+        max_bytes=int(os.getenv("CATALOG_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    ),
+    SharedGeneration(
+        os.getenv(
+            "CATALOG_CACHE_GENERATION_FILE",
+            os.path.join(tempfile.gettempdir(), "leafify-catalog-generation"),
+        )
+    ),
+    SharedGeneration(
+        os.getenv(
+            "CATALOG_CACHE_ROW_GENERATION_FILE",
+            os.path.join(tempfile.gettempdir(), "leafify-catalog-row-generations"),
+        ),
+        slots=int(os.getenv("CATALOG_CACHE_ROW_SLOTS", "4096")) + 1,
+    ),
+)
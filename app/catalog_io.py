@@ -0,0 +1,300 @@
+import codecs
+import csv
+import io
+import json
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.product_crud import (
+    bulk_create_products,
+    get_existing_product_names,
+    stream_catalog_rows,
+)
+from app.schemas.product_schema import (
+    CatalogImportReport,
+    CompleteAccessoryProductCreate,
+    CompletePlantProductCreate,
+    ImportRowError,
+)
+
+CATALOG_FORMATS = ("ndjson", "csv")
+DEFAULT_IMPORT_CHUNK_SIZE = 500
+DEFAULT_EXPORT_BATCH_SIZE = 1000
+# Keep the report bounded even for a completely broken file
+MAX_REPORTED_ERRORS = 1000
+
+# Flat CSV layout: product columns, then plant or accessory columns depending
+# on ``type``; the guide sections are JSON-encoded objects
+CSV_COLUMNS = (
+    "name",
+    "price",
+    "description",
+    "stock",
+    "type",
+    "category",
+    "water",
+    "light",
+    "soil_type",
+    "size",
+    "color",
+    "how_to_plant",
+    "care_guide",
+)
+
+CATALOG_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+CatalogRecord = Union[CompletePlantProductCreate, CompleteAccessoryProductCreate]
+
+
+async def aiter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into text lines without buffering the whole body"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+def csv_row_to_record(row: Dict[str, str]) -> Dict:
+    row = {key: value for key, value in row.items() if value not in (None, "")}
+    product = {
+        key: row[key]
+        for key in ("name", "price", "description", "stock", "type")
+        if key in row
+    }
+
+    if row.get("type") == "accessory":
+        return {
+            "product": product,
+            "accessory": {"size": row.get("size"), "color": row.get("color")},
+        }
+
+    record = {
+        "product": product,
+        "plant": {
+            key: row.get(key)
+            for key in ("category", "water", "light", "soil_type", "size")
+        },
+    }
+    if "how_to_plant" in row or "care_guide" in row:
+        record["plant_guide"] = {
+            "how_to_plant": json.loads(row.get("how_to_plant", "{}")),
+            "care_guide": json.loads(row.get("care_guide", "{}")),
+        }
+    return record
+
+
+def validate_record(data: Dict) -> CatalogRecord:
+    if not isinstance(data, dict) or not isinstance(data.get("product"), dict):
+        raise ValueError("record must be an object with a 'product' object")
+
+    if data["product"].get("type") == "accessory":
+        return CompleteAccessoryProductCreate(**data)
+
+    # The guide id is always the new product's id, so it's optional here
+    if isinstance(data.get("plant_guide"), dict):
+        data["plant_guide"].setdefault("id", "")
+    return CompletePlantProductCreate(**data)
+
+
+async def iter_catalog_rows(
+    lines: AsyncIterator[str], fmt: str
+) -> AsyncIterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """Yield (line number, raw record, parse error) for each non-blank line
+
+    CSV rows must fit on one line; embedded newlines are not supported.
+    """
+    header: Optional[List[str]] = None
+    line_no = 0
+
+    async for line in lines:
+        line_no += 1
+        if not line.strip():
+            continue
+
+        try:
+            if fmt == "ndjson":
+                yield line_no, json.loads(line), None
+            elif header is None:
+                header = [column.strip() for column in next(csv.reader([line]))]
+            else:
+                values = next(csv.reader([line]))
+                yield line_no, csv_row_to_record(dict(zip(header, values))), None
+        except (ValueError, csv.Error) as e:
+            yield line_no, None, f"Could not parse line: {e}"
+
+
+async def _import_chunk(
+    db: AsyncSession,
+    chunk: List[Tuple[int, CatalogRecord]],
+    report: CatalogImportReport,
+):
+    names = [record.product.name for _, record in chunk]
+    existing = await get_existing_product_names(db, names)
+
+    # Names are unique regardless of case, as under MySQL's collation
+    seen, accepted = set(), []
+    for line_no, record in chunk:
+        name = record.product.name
+        if name.casefold() in existing or name.casefold() in seen:
+            _report_error(report, line_no, name, "Product name already exists")
+            continue
+        seen.add(name.casefold())
+        accepted.append((line_no, record))
+
+    if not accepted:
+        return
+
+    try:
+        report.inserted += await bulk_create_products(
+            db, [record for _, record in accepted]
+        )
+    except IntegrityError:
+        # A concurrent writer took one of the names and the whole batch rolled
+        # back; insert row by row so only the conflicting rows fail
+        await db.rollback()
+        for line_no, record in accepted:
+            try:
+                report.inserted += await bulk_create_products(db, [record])
+            except IntegrityError as e:
+                await db.rollback()
+                _report_error(report, line_no, record.product.name, str(e.orig))
+
+
+def _format_error(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}"
+            for item in error.errors()
+        )
+    return str(error)
+
+
+def _report_error(
+    report: CatalogImportReport, line_no: int, name: Optional[str], error: str
+):
+    report.failed += 1
+    if len(report.errors) < MAX_REPORTED_ERRORS:
+        report.errors.append(ImportRowError(line=line_no, name=name, error=error))
+
+
+async def import_catalog(
+    db: AsyncSession,
+    lines: AsyncIterator[str],
+    fmt: str = "ndjson",
+    chunk_size: int = DEFAULT_IMPORT_CHUNK_SIZE,
+) -> CatalogImportReport:
+    """Validate and insert catalog records chunk by chunk from a line stream"""
+    report = CatalogImportReport()
+    chunk: List[Tuple[int, CatalogRecord]] = []
+
+    async for line_no, data, parse_error in iter_catalog_rows(lines, fmt):
+        if parse_error:
+            _report_error(report, line_no, None, parse_error)
+            continue
+
+        try:
+            chunk.append((line_no, validate_record(data)))
+        except (ValidationError, ValueError) as e:
+            product = data.get("product") if isinstance(data, dict) else None
+            name = product.get("name") if isinstance(product, dict) else None
+            _report_error(report, line_no, name, _format_error(e))
+            continue
+
+        if len(chunk) >= chunk_size:
+            await _import_chunk(db, chunk, report)
+            chunk = []
+
+    if chunk:
+        await _import_chunk(db, chunk, report)
+
+    return report
+
+
+def catalog_row_to_record(row) -> Dict:
+    """Nested export record in the same shape the importer accepts"""
+    record = {
+        "product": {
+            "id": row.id,
+            "name": row.name,
+            "price": row.price,
+            "description": row.description,
+            "stock": row.stock,
+            "type": row.type,
+        }
+    }
+
+    if row.category is not None:
+        record["plant"] = {
+            "category": row.category,
+            "water": row.water,
+            "light": row.light,
+            "soil_type": row.soil_type,
+            "size": row.plant_size,
+        }
+        if row.how_to_plant is not None:
+            record["plant_guide"] = {
+                "how_to_plant": row.how_to_plant,
+                "care_guide": row.care_guide,
+            }
+
+    if row.color is not None:
+        record["accessory"] = {"size": row.accessory_size, "color": row.color}
+
+    return record
+
+
+def catalog_row_to_csv(row) -> List:
+    return [
+        row.id,
+        row.name,
+        row.price,
+        row.description,
+        row.stock,
+        row.type,
+        row.category,
+        row.water,
+        row.light,
+        row.soil_type,
+        row.plant_size if row.category is not None else row.accessory_size,
+        row.color,
+        json.dumps(row.how_to_plant) if row.how_to_plant is not None else None,
+        json.dumps(row.care_guide) if row.care_guide is not None else None,
+    ]
+
+
+async def export_catalog(
+    db: AsyncSession, fmt: str = "ndjson", batch_size: int = DEFAULT_EXPORT_BATCH_SIZE
+) -> AsyncIterator[str]:
+    """Yield the catalog as NDJSON or CSV text, one cursor batch per chunk"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+
+    if fmt == "csv":
+        writer.writerow(("id",) + CSV_COLUMNS)
+
+    result = await stream_catalog_rows(db, batch_size=batch_size)
+    async for rows in result.partitions():
+        for row in rows:
+            if fmt == "csv":
+                writer.writerow(catalog_row_to_csv(row))
+            else:
+                buffer.write(json.dumps(catalog_row_to_record(row)))
+                buffer.write("\n")
+
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if fmt == "csv" and buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,263 @@
+import gzip
+import os
+import zlib
+from typing import Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.cache import TTLCache
+from app.http_cache import encoded_etag
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Bodies smaller than this are sent as-is; the framing would eat the savings
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+# Preferred first when the client accepts both equally
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best supported coding from an Accept-Encoding header"""
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+
+    best, best_weight = None, 0.0
+    for coding in SUPPORTED_ENCODINGS:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class _StreamCompressor:
+    """Incremental compressor for responses sent in several chunks"""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(
+                GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+            )
+
+    def compress(self, chunk: bytes) -> bytes:
+        # Flush every chunk so clients receive rows as they are produced
+        # instead of whenever the compressor's buffer fills
+        if self._brotli is not None:
+            return self._brotli.process(chunk) + self._brotli.flush()
+        return self._zlib.compress(chunk) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+def _is_compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    if "no-transform" in headers.get("cache-control", ""):
+        return False
+    content_type = headers.get("content-type", "")
+    return content_type.startswith(COMPRESSIBLE_TYPES) or "+json" in content_type
+
+
+def _add_vary(status_code: int, headers: MutableHeaders):
+    """Vary: Accept-Encoding on every response that could have been compressed
+
+    Whether a body is sent encoded depends on the request's Accept-Encoding
+    (and its size), so shared caches must key every such response on it, not
+    only the ones that ended up compressed. 304s carry the Vary of the
+    representation they revalidate.
+    """
+    if _is_compressible(headers) or (status_code == 304 and "etag" in headers):
+        headers.add_vary_header("Accept-Encoding")
+
+
+# Compressed bodies of cacheable responses, keyed by request target, ETag and
+# coding. The ETag changes with every row version, so entries never go stale.
+compressed_cache = TTLCache(
+    maxsize=int(os.getenv("COMPRESSION_CACHE_MAX_ENTRIES", "256")),
+    ttl=float(os.getenv("COMPRESSION_CACHE_TTL", "3600")),
+    max_bytes=int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+)
+
+
+class CompressionMiddleware:
+    """Negotiated gzip/brotli compression of response bodies
+
+    Single-message responses at least ``minimum_size`` long are compressed
+    whole; GET 200s carrying an ETag reuse a previously compressed body from
+    ``cache``. Streamed responses are compressed chunk by chunk.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        cache: Optional[TTLCache] = compressed_cache,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = cache
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None or scope["method"] == "HEAD":
+
+            async def send_identity(message: Message):
+                if message["type"] == "http.response.start":
+                    _add_vary(message["status"], MutableHeaders(raw=message["headers"]))
+                await send(message)
+
+            await self.app(scope, receive, send_identity)
+            return
+
+        responder = _CompressingResponder(self, scope, send, encoding)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+    def __init__(
+        self,
+        middleware: CompressionMiddleware,
+        scope: Scope,
+        send: Send,
+        encoding: str,
+    ):
+        self.middleware = middleware
+        self.scope = scope
+        self.downstream = send
+        self.encoding = encoding
+        self.start: Optional[Message] = None
+        self.passthrough = False
+        self.stream: Optional[_StreamCompressor] = None
+
+    def _cache_key(self, headers: Headers) -> Optional[Tuple]:
+        if (
+            self.middleware.cache is None
+            or self.scope["method"] != "GET"
+            or self.start["status"] != 200
+            or "etag" not in headers
+        ):
+            return None
+        return (
+            self.scope["path"],
+            self.scope.get("query_string", b""),
+            headers["etag"],
+            self.encoding,
+        )
+
+    def _mark_encoded(self, headers: MutableHeaders):
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if "etag" in headers:
+            headers["ETag"] = encoded_etag(headers["etag"], self.encoding)
+
+    def _mark_not_modified(self, headers: MutableHeaders):
+        # A 304 for an encoded variant carries that variant's ETag
+        if "etag" not in headers:
+            return
+        etag = encoded_etag(headers["etag"], self.encoding)
+        if_none_match = Headers(scope=self.scope).get("if-none-match", "")
+        if etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+            headers["ETag"] = etag
+
+    async def send(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self.downstream(message)
+            return
+
+        if self.passthrough:
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.stream is not None:
+            chunk = self.stream.compress(body)
+            if not more_body:
+                chunk += self.stream.finish()
+            await self.downstream(
+                {"type": "http.response.body", "body": chunk, "more_body": more_body}
+            )
+            return
+
+        # First body message: decide how the whole response is sent
+        headers = MutableHeaders(raw=self.start["headers"])
+        if (
+            self.start["status"] < 200
+            or self.start["status"] in (204, 304)
+            or not _is_compressible(headers)
+            or (not more_body and len(body) < self.middleware.minimum_size)
+        ):
+            self.passthrough = True
+            if self.start["status"] == 304:
+                self._mark_not_modified(headers)
+            _add_vary(self.start["status"], headers)
+            await self.downstream(self.start)
+            await self.downstream(message)
+            return
+
+        if more_body:
+            self.stream = _StreamCompressor(self.encoding)
+            self._mark_encoded(headers)
+            del headers["Content-Length"]
+            await self.downstream(self.start)
+            await self.downstream(
+                {
+                    "type": "http.response.body",
+                    "body": self.stream.compress(body),
+                    "more_body": True,
+                }
+            )
+            return
+
+        key = self._cache_key(headers)
+        compressed = self.middleware.cache.get(key) if key is not None else None
+        if compressed is None:
+            compressed = compress(body, self.encoding)
+            if key is not None:
+                self.middleware.cache.set(key, compressed, size=len(compressed))
+
+        self._mark_encoded(headers)
+        headers["Content-Length"] = str(len(compressed))
+        await self.downstream(self.start)
+        await self.downstream({"type": "http.response.body", "body": compressed})
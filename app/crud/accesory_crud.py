@@ -1,45 +1,73 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.accesories_model import Accessory
+from app.cache import catalog_cache
+from app.search import refresh_search_text
 from app.schemas.product_schema import AccessoryCreate, AccessoryUpdate
 
 
-def create_accessory(db: Session, accessory: AccessoryCreate):
+async def create_accessory(
+    db: AsyncSession, accessory: AccessoryCreate, commit: bool = True
+):
     db_accessory = Accessory(**accessory.dict())
     db.add(db_accessory)
-    db.commit()
-    db.refresh(db_accessory)
+    if commit:
+        await refresh_search_text(db, db_accessory.id)
+        await db.commit()
+        await db.refresh(db_accessory)
+        catalog_cache.invalidate()
     return db_accessory
 
 
-def get_all_accessories(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Accessory).offset(skip).limit(limit).all()
+async def get_all_accessories(db: AsyncSession, skip: int = 0, limit: int = 100):
+    result = await db.execute(select(Accessory).offset(skip).limit(limit))
+    return result.scalars().all()
 
 
-def get_accessory(db: Session, accessory_id: str):
-    return db.query(Accessory).filter(Accessory.id == accessory_id).first()
+async def get_accessory(db: AsyncSession, accessory_id: str):
+    result = await db.execute(select(Accessory).filter(Accessory.id == accessory_id))
+    return result.scalars().first()
 
 
-def get_accessories_by_size(db: Session, size: str):
-    return db.query(Accessory).filter(Accessory.size == size).all()
+async def get_accessory_versions(db: AsyncSession, accessory_id: str):
+    result = await db.execute(
+        select(Accessory.id, Accessory.version, Accessory.updated_at).filter(
+            Accessory.id == accessory_id
+        )
+    )
+    row = result.first()
+    return [tuple(row)] if row else None
 
 
-def get_accessories_by_color(db: Session, color: str):
-    return db.query(Accessory).filter(Accessory.color == color).all()
+async def get_accessories_by_size(db: AsyncSession, size: str):
+    result = await db.execute(select(Accessory).filter(Accessory.size == size))
+    return result.scalars().all()
 
 
-def update_accessory(db: Session, accessory_id: str, accessory: AccessoryUpdate):
-    db_accessory = get_accessory(db, accessory_id)
+async def get_accessories_by_color(db: AsyncSession, color: str):
+    result = await db.execute(select(Accessory).filter(Accessory.color == color))
+    return result.scalars().all()
+
+
+async def update_accessory(
+    db: AsyncSession, accessory_id: str, accessory: AccessoryUpdate
+):
+    db_accessory = await get_accessory(db, accessory_id)
     if db_accessory:
         for key, value in accessory.dict(exclude_unset=True).items():
             setattr(db_accessory, key, value)
-        db.commit()
-        db.refresh(db_accessory)
+        await refresh_search_text(db, accessory_id)
+        await db.commit()
+        await db.refresh(db_accessory)
+        catalog_cache.invalidate()
     return db_accessory
 
 
-def delete_accessory(db: Session, accessory_id: str):
-    db_accessory = get_accessory(db, accessory_id)
+async def delete_accessory(db: AsyncSession, accessory_id: str):
+    db_accessory = await get_accessory(db, accessory_id)
     if db_accessory:
-        db.delete(db_accessory)
-        db.commit()
-    return db_accessory
\ No newline at end of file
+        await db.delete(db_accessory)
+        await refresh_search_text(db, accessory_id)
+        await db.commit()
+        catalog_cache.invalidate()
+    return db_accessory
@@ -0,0 +1,202 @@
+from typing import Iterable, Mapping, Optional, Sequence
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache import catalog_cache
+from app.http_cache import row_versions
+from app.crud.product_crud import (
+    get_all_products,
+    get_product,
+    get_product_versions,
+    search_products,
+)
+from app.crud.plant_crud import (
+    browse_plants,
+    get_all_plants,
+    get_plant,
+    get_plant_facet_counts,
+    get_plant_versions,
+)
+from app.crud.plantguide_crud import (
+    get_all_plant_guides,
+    get_plant_guide,
+    get_plant_guide_versions,
+)
+from app.crud.accesory_crud import get_accessory, get_accessory_versions
+
+# Read-through wrappers around the catalog CRUD functions. They return plain
+# dicts so cached values never hold on to a session; writes in the CRUD
+# modules invalidate the cache after they commit. The ``*_versions``
+# functions answer conditional requests from the cache when the payload is
+# there, and with a version-only query otherwise.
+
+
+def _columns(obj) -> dict:
+    return {column.key: getattr(obj, column.key) for column in obj.__table__.columns}
+
+
+async def get_cached_products(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    product_type: Optional[str] = None,
+    in_stock: bool = False,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    name_prefix: Optional[str] = None,
+    expand: Iterable[str] = (),
+):
+    expand = tuple(sorted(expand))
+    key = (
+        "products",
+        skip if after is None else None,
+        limit,
+        after,
+        product_type,
+        in_stock,
+        min_price,
+        max_price,
+        name_prefix,
+        expand,
+    )
+
+    async def load():
+        products = await get_all_products(
+            db,
+            skip=skip,
+            limit=limit,
+            after=after,
+            product_type=product_type,
+            in_stock=in_stock,
+            min_price=min_price,
+            max_price=max_price,
+            name_prefix=name_prefix,
+            expand=expand,
+        )
+        return [product.to_dict() for product in products]
+
+    return await catalog_cache.get_or_load(key, load)
+
+
+async def get_cached_search(
+    db: AsyncSession,
+    query: str,
+    limit: int = 20,
+    after: Optional[Sequence] = None,
+    expand: Iterable[str] = (),
+):
+    expand = tuple(sorted(expand))
+
+    async def load():
+        rows = await search_products(db, query, limit=limit, after=after, expand=expand)
+        return [{**product.to_dict(), "score": score} for product, score in rows]
+
+    key = ("search", query, limit, tuple(after) if after else None, expand)
+    return await catalog_cache.get_or_load(key, load)
+
+
+async def get_cached_product(
+    db: AsyncSession, product_id: str, expand: Iterable[str] = ()
+):
+    expand = tuple(sorted(expand))
+
+    async def load():
+        product = await get_product(db, product_id=product_id, expand=expand)
+        return product.to_dict() if product else None
+
+    return await catalog_cache.get_or_load(("product", product_id, expand), load)
+
+
+async def get_cached_product_versions(
+    db: AsyncSession, product_id: str, expand: Iterable[str] = ()
+):
+    expand = tuple(sorted(expand))
+    payload = catalog_cache.get(("product", product_id, expand))
+    if payload is not None:
+        return row_versions(payload)
+    return await get_product_versions(db, product_id=product_id, expand=expand)
+
+
+async def get_cached_plants(
+    db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[str] = None
+):
+    async def load():
+        plants = await get_all_plants(db, skip=skip, limit=limit, after=after)
+        return [_columns(plant) for plant in plants]
+
+    key = ("plants", skip if after is None else None, limit, after)
+    return await catalog_cache.get_or_load(key, load)
+
+
+async def get_cached_plant_browse(
+    db: AsyncSession,
+    filters: Mapping[str, str],
+    limit: int = 20,
+    after: Optional[str] = None,
+):
+    filters = {facet: value for facet, value in filters.items() if value is not None}
+
+    async def load():
+        products = await browse_plants(db, filters, limit=limit, after=after)
+        return {
+            "items": [product.to_dict() for product in products],
+            "facets": await get_plant_facet_counts(db, filters),
+        }
+
+    key = ("plant_browse", tuple(sorted(filters.items())), limit, after)
+    return await catalog_cache.get_or_load(key, load)
+
+
+async def get_cached_plant(db: AsyncSession, plant_id: str):
+    async def load():
+        plant = await get_plant(db, plant_id=plant_id)
+        return _columns(plant) if plant else None
+
+    return await catalog_cache.get_or_load(("plant", plant_id), load)
+
+
+async def get_cached_plant_versions(db: AsyncSession, plant_id: str):
+    payload = catalog_cache.get(("plant", plant_id))
+    if payload is not None:
+        return row_versions(payload)
+    return await get_plant_versions(db, plant_id=plant_id)
+
+
+async def get_cached_accessory(db: AsyncSession, accessory_id: str):
+    async def load():
+        accessory = await get_accessory(db, accessory_id=accessory_id)
+        return _columns(accessory) if accessory else None
+
+    return await catalog_cache.get_or_load(("accessory", accessory_id), load)
+
+
+async def get_cached_accessory_versions(db: AsyncSession, accessory_id: str):
+    payload = catalog_cache.get(("accessory", accessory_id))
+    if payload is not None:
+        return row_versions(payload)
+    return await get_accessory_versions(db, accessory_id=accessory_id)
+
+
+async def get_cached_plant_guides(
+    db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[str] = None
+):
+    async def load():
+        guides = await get_all_plant_guides(db, skip=skip, limit=limit, after=after)
+        return [_columns(guide) for guide in guides]
+
+    key = ("plant_guides", skip if after is None else None, limit, after)
+    return await catalog_cache.get_or_load(key, load)
+
+
+async def get_cached_plant_guide(db: AsyncSession, plant_id: str):
+    async def load():
+        guide = await get_plant_guide(db, plant_id=plant_id)
+        return _columns(guide) if guide else None
+
+    return await catalog_cache.get_or_load(("plant_guide", plant_id), load)
+
+
+async def get_cached_plant_guide_versions(db: AsyncSession, plant_id: str):
+    payload = catalog_cache.get(("plant_guide", plant_id))
+    if payload is not None:
+        return row_versions(payload)
+    return await get_plant_guide_versions(db, plant_id=plant_id)
@@ -1,50 +1,229 @@
-from sqlalchemy.orm import Session
-from app.models import Order
+import os
+from uuid import uuid4
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import delete, extract, func, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.models import Order, OrderItem, Product, UserOrderSummary
 from app.schemas.order_schema import OrderCreate, OrderUpdate
-
-
-def create_order(db: Session, order: OrderCreate):
-    db_order = Order(**order.dict())
+from app.cache import catalog_cache
+from app.crud.product_crud import reserve_stock
+
+# Hard cap on orders returned by a listing
+MAX_ORDER_ROWS = 100
+
+# Keep user_order_summaries up to date at checkout and read totals from it
+ORDER_SUMMARIES = os.getenv("ORDER_SUMMARIES", "true").lower() == "true"
+
+
+async def checkout_order(
+    db: AsyncSession, user_id: int, order: OrderCreate
+) -> Tuple[Optional[Order], List[Dict]]:
+    """Reserve stock and create the order with its items in one transaction
+
+    Returns ``(order, [])`` on success, or ``(None, short_items)`` when any
+    item is out of stock, in which case nothing is written.
+    """
+    quantities = {}
+    for item in order.items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+
+    short = await reserve_stock(db, quantities, commit=False)
+    if short:
+        return None, short
+
+    # The reservation holds these rows' locks, so prices can't move under us
+    result = await db.execute(
+        select(Product.id, Product.price).filter(Product.id.in_(list(quantities)))
+    )
+    prices = dict(result.all())
+
+    db_order = Order(
+        id=str(uuid4()),
+        user_id=user_id,
+        transac_id=order.transac_id,
+        total_price=sum(prices[pid] * n for pid, n in quantities.items()),
+        items=[
+            OrderItem(product_id=pid, quantity=n, unit_price=prices[pid])
+            for pid, n in quantities.items()
+        ],
+    )
     db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
-    return db_order
-
-
-def get_all_orders(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Order).offset(skip).limit(limit).all()
-
-
-def get_order(db: Session, order_id: str):
-    return db.query(Order).filter(Order.id == order_id).first()
-
-
-def get_orders_by_user(db: Session, user_id: str):
-    return db.query(Order).filter(Order.user_id == user_id).all()
-
-
-def get_order_by_transaction(db: Session, transac_id: str):
-    return db.query(Order).filter(Order.transac_id == transac_id).first()
-
 
-def update_order(db: Session, order_id: str, order: OrderUpdate):
-    db_order = get_order(db, order_id)
+    # Flushes the order, then all of its items as one batched INSERT
+    await db.flush()
+    await _apply_to_summary(db, db_order)
+
+    await db.commit()
+    catalog_cache.invalidate_rows(quantities)
+    return db_order, []
+
+
+async def _apply_to_summary(db: AsyncSession, db_order: Order):
+    summary = UserOrderSummary.__table__
+    if not ORDER_SUMMARIES:
+        # Drop the row so it's rebuilt from history if summaries are re-enabled
+        await db.execute(delete(summary).where(summary.c.user_id == db_order.user_id))
+        return
+
+    result = await db.execute(
+        update(summary)
+        .where(summary.c.user_id == db_order.user_id)
+        .values(
+            order_count=summary.c.order_count + 1,
+            total_spent=summary.c.total_spent + db_order.total_price,
+            last_order_at=db_order.created_at,
+        )
+    )
+    if result.rowcount:
+        return
+
+    # First order since summaries were enabled: seed from the user's history,
+    # which already includes the order just flushed
+    seed = select(
+        literal(db_order.user_id),
+        func.count(Order.id),
+        func.sum(Order.total_price),
+        func.max(Order.created_at),
+    ).filter(Order.user_id == db_order.user_id)
+    try:
+        async with db.begin_nested():
+            await db.execute(
+                insert(summary).from_select(
+                    ["user_id", "order_count", "total_spent", "last_order_at"], seed
+                )
+            )
+    except IntegrityError:
+        # A concurrent checkout seeded it first; that seed predates our order
+        await _apply_to_summary(db, db_order)
+
+
+async def get_all_orders(db: AsyncSession, skip: int = 0, limit: int = 100):
+    result = await db.execute(
+        select(Order)
+        .options(selectinload(Order.items))
+        .order_by(Order.created_at.desc(), Order.id)
+        .offset(skip)
+        .limit(min(limit, MAX_ORDER_ROWS))
+    )
+    return result.scalars().all()
+
+
+async def get_order(db: AsyncSession, order_id: str):
+    result = await db.execute(
+        select(Order).options(selectinload(Order.items)).filter(Order.id == order_id)
+    )
+    return result.scalars().first()
+
+
+async def get_orders_by_user(
+    db: AsyncSession, user_id: int, skip: int = 0, limit: int = 100
+):
+    # Walks ix_orders_user_id_created_at; items come from one SELECT ... IN
+    result = await db.execute(
+        select(Order)
+        .options(selectinload(Order.items))
+        .filter(Order.user_id == user_id)
+        .order_by(Order.created_at.desc(), Order.id)
+        .offset(skip)
+        .limit(min(limit, MAX_ORDER_ROWS))
+    )
+    return result.scalars().all()
+
+
+async def get_order_by_transaction(db: AsyncSession, transac_id: str):
+    result = await db.execute(
+        select(Order)
+        .options(selectinload(Order.items))
+        .filter(Order.transac_id == transac_id)
+    )
+    return result.scalars().first()
+
+
+async def update_order(db: AsyncSession, order_id: str, order: OrderUpdate):
+    db_order = await get_order(db, order_id)
     if db_order:
         for key, value in order.dict(exclude_unset=True).items():
             setattr(db_order, key, value)
-        db.commit()
-        db.refresh(db_order)
+        await db.commit()
     return db_order
 
 
-def delete_order(db: Session, order_id: str):
-    db_order = get_order(db, order_id)
+async def delete_order(db: AsyncSession, order_id: str):
+    db_order = await get_order(db, order_id)
     if db_order:
-        db.delete(db_order)
-        db.commit()
+        await db.delete(db_order)
+        # Rebuilt from history on the user's next checkout
+        await db.execute(
+            delete(UserOrderSummary).where(UserOrderSummary.user_id == db_order.user_id)
+        )
+        await db.commit()
     return db_order
 
 
-def get_user_total_spent(db: Session, user_id: str):
-    orders = get_orders_by_user(db, user_id)
-    return sum(order.total_price for order in orders)
\ No newline at end of file
+async def get_user_order_totals(db: AsyncSession, user_id: int) -> Dict:
+    """Order count, total spent and last order date for one user
+
+    Reads the summary row when summaries are enabled, otherwise aggregates
+    the user's orders in the database.
+    """
+    if ORDER_SUMMARIES:
+        result = await db.execute(
+            select(
+                UserOrderSummary.order_count,
+                UserOrderSummary.total_spent,
+                UserOrderSummary.last_order_at,
+            ).filter(UserOrderSummary.user_id == user_id)
+        )
+        row = result.first()
+        if row is not None:
+            return dict(row._mapping)
+
+    result = await db.execute(
+        select(
+            func.count(Order.id).label("order_count"),
+            func.coalesce(func.sum(Order.total_price), 0).label("total_spent"),
+            func.max(Order.created_at).label("last_order_at"),
+        ).filter(Order.user_id == user_id)
+    )
+    return dict(result.one()._mapping)
+
+
+async def get_user_total_spent(db: AsyncSession, user_id: int):
+    totals = await get_user_order_totals(db, user_id)
+    return totals["total_spent"]
+
+
+async def get_user_monthly_spend(db: AsyncSession, user_id: int):
+    year = extract("year", Order.created_at).label("year")
+    month = extract("month", Order.created_at).label("month")
+    result = await db.execute(
+        select(
+            year,
+            month,
+            func.count(Order.id).label("order_count"),
+            func.sum(Order.total_price).label("total_spent"),
+        )
+        .filter(Order.user_id == user_id)
+        .group_by(year, month)
+        .order_by(year, month)
+    )
+    return [dict(row._mapping) for row in result.all()]
+
+
+async def get_user_spend_by_product_type(db: AsyncSession, user_id: int):
+    result = await db.execute(
+        select(
+            Product.type.label("type"),
+            func.sum(OrderItem.quantity).label("quantity"),
+            func.sum(OrderItem.quantity * OrderItem.unit_price).label("total_spent"),
+        )
+        .select_from(Order)
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .join(Product, Product.id == OrderItem.product_id)
+        .filter(Order.user_id == user_id)
+        .group_by(Product.type)
+        .order_by(Product.type)
+    )
+    return [dict(row._mapping) for row in result.all()]
@@ -1,53 +1,146 @@
-from sqlalchemy.orm import Session
+from typing import Dict, Mapping, Optional
+from sqlalchemy import func, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager
+from app.models.order_model import Product
 from app.models.plant_model import Plant
+from app.cache import catalog_cache
+from app.search import refresh_search_text
 from app.schemas.product_schema import PlantCreate, PlantUpdate
 
+# Plant attributes that can be filtered on and counted when browsing
+PLANT_FACETS = ("category", "water", "light", "size", "soil_type")
 
-def create_plant(db: Session, plant: PlantCreate):
+
+async def create_plant(db: AsyncSession, plant: PlantCreate, commit: bool = True):
     db_plant = Plant(**plant.dict())
     db.add(db_plant)
-    db.commit()
-    db.refresh(db_plant)
+    if commit:
+        await refresh_search_text(db, db_plant.id)
+        await db.commit()
+        await db.refresh(db_plant)
+        catalog_cache.invalidate()
     return db_plant
 
 
-def get_all_plants(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Plant).offset(skip).limit(limit).all()
+async def get_all_plants(
+    db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[str] = None
+):
+    query = select(Plant).order_by(Plant.id)
+    if after is not None:
+        query = query.filter(Plant.id > after)
+    else:
+        query = query.offset(skip)
+
+    result = await db.execute(query.limit(limit))
+    return result.scalars().all()
+
+
+async def get_plant(db: AsyncSession, plant_id: str):
+    result = await db.execute(select(Plant).filter(Plant.id == plant_id))
+    return result.scalars().first()
+
+
+async def get_plant_versions(db: AsyncSession, plant_id: str):
+    result = await db.execute(
+        select(Plant.id, Plant.version, Plant.updated_at).filter(Plant.id == plant_id)
+    )
+    row = result.first()
+    return [tuple(row)] if row else None
 
 
-def get_plant(db: Session, plant_id: str):
-    return db.query(Plant).filter(Plant.id == plant_id).first()
+def _facet_filters(filters: Mapping[str, str], exclude: Optional[str] = None):
+    return [
+        getattr(Plant, facet) == value
+        for facet, value in filters.items()
+        if facet != exclude and value is not None
+    ]
 
 
-def get_plants_by_category(db: Session, category: str):
-    return db.query(Plant).filter(Plant.category == category).all()
+async def browse_plants(
+    db: AsyncSession,
+    filters: Mapping[str, str],
+    limit: int = 20,
+    after: Optional[str] = None,
+):
+    """One page of plant products matching every filter, ordered by id"""
+    query = (
+        select(Product)
+        .join(Plant, Plant.id == Product.id)
+        .options(contains_eager(Product.plant))
+        .filter(*_facet_filters(filters))
+        .order_by(Product.id)
+    )
+    if after is not None:
+        query = query.filter(Product.id > after)
 
+    result = await db.execute(query.limit(limit))
+    return result.scalars().all()
 
-def get_plants_by_water_needs(db: Session, water: str):
-    return db.query(Plant).filter(Plant.water == water).all()
 
+async def get_plant_facet_counts(
+    db: AsyncSession, filters: Mapping[str, str]
+) -> Dict[str, Dict[str, int]]:
+    """Counts per value of every facet, all in one UNION ALL query
 
-def get_plants_by_light_needs(db: Session, light: str):
-    return db.query(Plant).filter(Plant.light == light).all()
+    Each facet's counts ignore that facet's own filter, so the sidebar still
+    shows what selecting a different value would match.
+    """
+    counts = [
+        select(
+            literal(facet).label("facet"),
+            getattr(Plant, facet).label("value"),
+            func.count().label("count"),
+        )
+        .filter(*_facet_filters(filters, exclude=facet))
+        .group_by(getattr(Plant, facet))
+        for facet in PLANT_FACETS
+    ]
+    result = await db.execute(union_all(*counts))
 
+    facets = {facet: {} for facet in PLANT_FACETS}
+    for facet, value, count in result.all():
+        facets[facet][value] = count
+    return facets
 
-def get_plants_by_size(db: Session, size: str):
-    return db.query(Plant).filter(Plant.size == size).all()
 
+async def get_plants_by_category(db: AsyncSession, category: str):
+    result = await db.execute(select(Plant).filter(Plant.category == category))
+    return result.scalars().all()
 
-def update_plant(db: Session, plant_id: str, plant: PlantUpdate):
-    db_plant = get_plant(db, plant_id)
+
+async def get_plants_by_water_needs(db: AsyncSession, water: str):
+    result = await db.execute(select(Plant).filter(Plant.water == water))
+    return result.scalars().all()
+
+
+async def get_plants_by_light_needs(db: AsyncSession, light: str):
+    result = await db.execute(select(Plant).filter(Plant.light == light))
+    return result.scalars().all()
+
+
+async def get_plants_by_size(db: AsyncSession, size: str):
+    result = await db.execute(select(Plant).filter(Plant.size == size))
+    return result.scalars().all()
+
+
+async def update_plant(db: AsyncSession, plant_id: str, plant: PlantUpdate):
+    db_plant = await get_plant(db, plant_id)
     if db_plant:
         for key, value in plant.dict(exclude_unset=True).items():
             setattr(db_plant, key, value)
-        db.commit()
-        db.refresh(db_plant)
+        await refresh_search_text(db, plant_id)
+        await db.commit()
+        await db.refresh(db_plant)
+        catalog_cache.invalidate()
     return db_plant
 
 
-def delete_plant(db: Session, plant_id: str):
-    db_plant = get_plant(db, plant_id)
+async def delete_plant(db: AsyncSession, plant_id: str):
+    db_plant = await get_plant(db, plant_id)
     if db_plant:
-        db.delete(db_plant)
-        db.commit()
-    return db_plant
\ No newline at end of file
+        await db.delete(db_plant)
+        await refresh_search_text(db, plant_id)
+        await db.commit()
+        catalog_cache.invalidate()
+    return db_plant
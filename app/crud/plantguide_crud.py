@@ -1,37 +1,154 @@
-from sqlalchemy.orm import Session
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.plant_model import PlantGuide
+from app.cache import catalog_cache
+from app.search import refresh_search_text
 from app.schemas.plantguide_schema import PlantGuideCreate, PlantGuideUpdate
 
+# SQL functions implementing RFC 7386 merge patch natively
+MERGE_PATCH_FUNCTIONS = {
+    "mysql": "json_merge_patch",
+    "mariadb": "json_merge_patch",
+    "sqlite": "json_patch",
+}
 
-def create_plant_guide(db: Session, plant_guide: PlantGuideCreate):
+
+def merge_patch(target: Any, patch: Any) -> Any:
+    """Apply an RFC 7386 merge patch: objects merge, null removes a key"""
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+async def create_plant_guide(
+    db: AsyncSession, plant_guide: PlantGuideCreate, commit: bool = True
+):
     db_plant_guide = PlantGuide(**plant_guide.dict())
     db.add(db_plant_guide)
-    db.commit()
-    db.refresh(db_plant_guide)
+    if commit:
+        await refresh_search_text(db, db_plant_guide.id)
+        await db.commit()
+        await db.refresh(db_plant_guide)
+        catalog_cache.invalidate()
     return db_plant_guide
 
 
-def get_all_plant_guides(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(PlantGuide).offset(skip).limit(limit).all()
+async def get_all_plant_guides(
+    db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[str] = None
+):
+    query = select(PlantGuide).order_by(PlantGuide.id)
+    if after is not None:
+        query = query.filter(PlantGuide.id > after)
+    else:
+        query = query.offset(skip)
+
+    result = await db.execute(query.limit(limit))
+    return result.scalars().all()
 
 
-def get_plant_guide(db: Session, plant_id: str):
-    return db.query(PlantGuide).filter(PlantGuide.id == plant_id).first()
+async def get_plant_guide(db: AsyncSession, plant_id: str):
+    result = await db.execute(select(PlantGuide).filter(PlantGuide.id == plant_id))
+    return result.scalars().first()
 
 
-def update_plant_guide(db: Session, plant_id: str, plant_guide: PlantGuideUpdate):
-    db_plant_guide = get_plant_guide(db, plant_id)
+async def get_plant_guide_versions(db: AsyncSession, plant_id: str):
+    result = await db.execute(
+        select(PlantGuide.id, PlantGuide.version, PlantGuide.updated_at).filter(
+            PlantGuide.id == plant_id
+        )
+    )
+    row = result.first()
+    return [tuple(row)] if row else None
+
+
+async def update_plant_guide(
+    db: AsyncSession, plant_id: str, plant_guide: PlantGuideUpdate
+):
+    db_plant_guide = await get_plant_guide(db, plant_id)
     if db_plant_guide:
         for key, value in plant_guide.dict(exclude_unset=True).items():
             setattr(db_plant_guide, key, value)
-        db.commit()
-        db.refresh(db_plant_guide)
+        await refresh_search_text(db, plant_id)
+        await db.commit()
+        await db.refresh(db_plant_guide)
+        catalog_cache.invalidate()
     return db_plant_guide
 
 
-def delete_plant_guide(db: Session, plant_id: str):
-    db_plant_guide = get_plant_guide(db, plant_id)
+async def merge_patch_plant_guide(
+    db: AsyncSession,
+    plant_id: str,
+    section: str,
+    patch: Dict[str, Any],
+    expected_version: Optional[int] = None,
+):
+    """Merge-patch one section of a guide in place
+
+    On MySQL and SQLite the merge runs inside the UPDATE, so only the delta
+    is sent and concurrent patches to different keys both land. Elsewhere the
+    row is locked while the section is merged here. Returns None when the
+    guide is gone or its version no longer matches expected_version.
+    """
+    column = getattr(PlantGuide, section)
+    function = MERGE_PATCH_FUNCTIONS.get(db.get_bind().dialect.name)
+    if function is not None:
+        merged = getattr(func, function)(column, json.dumps(patch))
+    else:
+        result = await db.execute(
+            select(column).filter(PlantGuide.id == plant_id).with_for_update()
+        )
+        row = result.first()
+        if row is None:
+            return None
+        merged = merge_patch(row[0], patch)
+
+    # The ORM would rewrite the whole document, so bump the version by hand
+    query = (
+        update(PlantGuide)
+        .where(PlantGuide.id == plant_id)
+        .values(
+            {
+                section: merged,
+                "version": PlantGuide.version + 1,
+                "updated_at": datetime.utcnow(),
+            }
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if expected_version is not None:
+        query = query.where(PlantGuide.version == expected_version)
+
+    result = await db.execute(query)
+    if result.rowcount != 1:
+        await db.rollback()
+        return None
+
+    await refresh_search_text(db, plant_id)
+    await db.commit()
+    catalog_cache.invalidate()
+
+    result = await db.execute(
+        select(PlantGuide)
+        .filter(PlantGuide.id == plant_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
+
+async def delete_plant_guide(db: AsyncSession, plant_id: str):
+    db_plant_guide = await get_plant_guide(db, plant_id)
     if db_plant_guide:
-        db.delete(db_plant_guide)
-        db.commit()
-    return db_plant_guide
\ No newline at end of file
+        await db.delete(db_plant_guide)
+        await refresh_search_text(db, plant_id)
+        await db.commit()
+        catalog_cache.invalidate()
+    return db_plant_guide
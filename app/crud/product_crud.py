@@ -1,61 +1,527 @@
+from datetime import datetime
 from uuid import uuid4
-from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Union
+from sqlalchemy import (
+    and_,
+    case,
+    column,
+    func,
+    insert,
+    literal_column,
+    or_,
+    select,
+    table,
+    update,
+)
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from app.models.order_model import Product
-from app.schemas.product_schema import ProductCreate, ProductUpdate
+from app.models.plant_model import Plant, PlantGuide
+from app.models.accesories_model import Accessory
+from app.schemas.plantguide_schema import PlantGuideCreate
+from app.schemas.product_schema import (
+    AccessoryCreate,
+    CompleteAccessoryProductCreate,
+    CompletePlantProductCreate,
+    PlantCreate,
+    ProductCreate,
+    ProductUpdate,
+)
+from app.cache import catalog_cache
+from app.search import product_search_text, refresh_search_text, search_terms
+from app.crud.plant_crud import create_plant
+from app.crud.plantguide_crud import create_plant_guide
+from app.crud.accesory_crud import create_accessory
 
+# Hard cap on rows any product listing query may return
+MAX_PRODUCT_ROWS = 100
 
-def create_product(db: Session, product: ProductCreate):
+# Relationships that can be eager-loaded with ``expand``
+PRODUCT_EXPANSIONS = ("plant", "plant_guide", "accessory")
+
+
+async def create_product(db: AsyncSession, product: ProductCreate, commit: bool = True):
     product_data = product.dict(exclude_unset=True)
     product_data["id"] = str(uuid4())
     db_product = Product(**product_data)
+    db_product.search_text = product_search_text(db_product)
     db.add(db_product)
-    db.commit()
-    db.refresh(db_product)
+    if commit:
+        await db.commit()
+        await db.refresh(db_product)
+        catalog_cache.invalidate()
+    return db_product
+
+
+async def create_plant_product(
+    db: AsyncSession, plant_product: CompletePlantProductCreate
+):
+    """Create the product, plant and optional guide in a single transaction
+
+    The product id is assigned up front, so the rows are flushed together on
+    one commit with no refresh round-trips, and a failure leaves nothing behind.
+    """
+    db_product = await create_product(db, plant_product.product, commit=False)
+
+    plant_data = plant_product.plant.dict()
+    plant_data["id"] = db_product.id
+    db_plant = await create_plant(db, PlantCreate(**plant_data), commit=False)
+    db_product.plant = db_plant
+
+    if plant_product.plant_guide:
+        guide_data = plant_product.plant_guide.dict()
+        guide_data["id"] = db_product.id
+        db_plant.plant_guide = await create_plant_guide(
+            db, PlantGuideCreate(**guide_data), commit=False
+        )
+    else:
+        # Mark the relationship as loaded so to_dict doesn't need a query
+        db_plant.plant_guide = None
+
+    db_product.search_text = product_search_text(
+        db_product, db_plant, db_plant.plant_guide
+    )
+    await db.commit()
+    catalog_cache.invalidate()
     return db_product
 
 
-def get_all_products(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Product).offset(skip).limit(limit).all()
+async def create_accessory_product(
+    db: AsyncSession, accessory_product: CompleteAccessoryProductCreate
+):
+    """Create the product and its accessory row in a single transaction"""
+    db_product = await create_product(db, accessory_product.product, commit=False)
+
+    accessory_data = accessory_product.accessory.dict()
+    accessory_data["id"] = db_product.id
+    db_product.accessory = await create_accessory(
+        db, AccessoryCreate(**accessory_data), commit=False
+    )
+
+    db_product.search_text = product_search_text(
+        db_product, accessory=db_product.accessory
+    )
+    await db.commit()
+    catalog_cache.invalidate()
+    return db_product
+
+
+async def get_existing_product_names(db: AsyncSession, names: Sequence[str]):
+    """Casefolded names of stored products matching ``names`` in any case"""
+    if not names:
+        return set()
+    if db.get_bind().dialect.name in ("mysql", "mariadb"):
+        # The default collation already compares case-insensitively, and a
+        # bare column keeps the unique index usable
+        query = select(Product.name).filter(Product.name.in_(names))
+    else:
+        lowered = {name.lower() for name in names}
+        query = select(Product.name).filter(func.lower(Product.name).in_(lowered))
+    result = await db.execute(query)
+    return {name.casefold() for name in result.scalars().all()}
+
+
+async def bulk_create_products(
+    db: AsyncSession,
+    records: Sequence[
+        Union[CompletePlantProductCreate, CompleteAccessoryProductCreate]
+    ],
+):
+    """Insert a batch of complete products with one multi-row INSERT per table"""
+    products, plants, guides, accessories = [], [], [], []
+
+    for record in records:
+        product_data = record.product.dict(exclude_unset=True)
+        product_data["id"] = str(uuid4())
+        product_data.setdefault("stock", 0)
+        products.append(product_data)
+
+        if isinstance(record, CompletePlantProductCreate):
+            product_data["search_text"] = product_search_text(
+                record.product, record.plant, record.plant_guide
+            )
+            plants.append({**record.plant.dict(), "id": product_data["id"]})
+            if record.plant_guide:
+                guides.append({**record.plant_guide.dict(), "id": product_data["id"]})
+        else:
+            product_data["search_text"] = product_search_text(
+                record.product, accessory=record.accessory
+            )
+            accessories.append({**record.accessory.dict(), "id": product_data["id"]})
+
+    # Parents first so the foreign keys resolve
+    for model, rows in (
+        (Product, products),
+        (Plant, plants),
+        (PlantGuide, guides),
+        (Accessory, accessories),
+    ):
+        if rows:
+            await db.execute(insert(model), rows)
+
+    await db.commit()
+    catalog_cache.invalidate()
+    return len(products)
+
+
+def _expand_options(expand: Iterable[str]):
+    # One SELECT ... IN per relationship, however many products are on the page
+    options = []
+    if "plant_guide" in expand:
+        options.append(selectinload(Product.plant).selectinload(Plant.plant_guide))
+    elif "plant" in expand:
+        options.append(selectinload(Product.plant))
+    if "accessory" in expand:
+        options.append(selectinload(Product.accessory))
+    return options
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def get_all_products(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    product_type: Optional[str] = None,
+    in_stock: bool = False,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    name_prefix: Optional[str] = None,
+    expand: Iterable[str] = (),
+):
+    # Ordered by primary key so pages are stable; ``after`` seeks past the
+    # previous page's last id instead of scanning and discarding ``skip`` rows
+    query = select(Product).order_by(Product.id)
+
+    options = _expand_options(expand)
+    if options:
+        query = query.options(*options).execution_options(populate_existing=True)
+
+    if product_type:
+        query = query.filter(Product.type == product_type)
+    if in_stock:
+        query = query.filter(Product.stock > 0)
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Product.price <= max_price)
+    if name_prefix:
+        query = query.filter(
+            Product.name.like(_escape_like(name_prefix) + "%", escape="\\")
+        )
+
+    if after is not None:
+        query = query.filter(Product.id > after)
+    else:
+        query = query.offset(skip)
+
+    result = await db.execute(query.limit(min(limit, MAX_PRODUCT_ROWS)))
+    return result.scalars().all()
+
+
+async def get_product(db: AsyncSession, product_id: str, expand: Iterable[str] = ()):
+    query = select(Product).filter(Product.id == product_id)
+
+    options = _expand_options(expand)
+    if options:
+        query = query.options(*options).execution_options(populate_existing=True)
+
+    result = await db.execute(query)
+    return result.scalars().first()
+
+
+async def get_product_versions(
+    db: AsyncSession, product_id: str, expand: Iterable[str] = ()
+):
+    """(id, version, updated_at) of each row ``get_product`` would embed
 
+    Only version columns are read, so conditional GETs can be answered
+    without loading or serializing the guide documents.
+    """
+    query = select(Product.id, Product.version, Product.updated_at)
+    if "plant" in expand or "plant_guide" in expand:
+        query = query.outerjoin(Plant, Plant.id == Product.id)
+        query = query.add_columns(Plant.id, Plant.version, Plant.updated_at)
+    if "plant_guide" in expand:
+        query = query.outerjoin(PlantGuide, PlantGuide.id == Plant.id)
+        query = query.add_columns(
+            PlantGuide.id, PlantGuide.version, PlantGuide.updated_at
+        )
+    if "accessory" in expand:
+        query = query.outerjoin(Accessory, Accessory.id == Product.id)
+        query = query.add_columns(Accessory.id, Accessory.version, Accessory.updated_at)
 
-def get_product(db: Session, product_id: str):
-    return db.query(Product).filter(Product.id == product_id).first()
+    result = await db.execute(query.filter(Product.id == product_id))
+    row = result.first()
+    if row is None:
+        return None
 
+    versions = [tuple(row[i : i + 3]) for i in range(0, len(row), 3)]
+    return [version for version in versions if version[0] is not None]
 
-def get_product_by_name(db: Session, product_name: str):
-    return db.query(Product).filter(Product.name == product_name).first()
 
+async def get_product_with_details(db: AsyncSession, product_id: str):
+    # Relationships can't lazy-load under asyncio, so load everything to_dict needs
+    return await get_product(db, product_id, expand=PRODUCT_EXPANSIONS)
 
-def get_products_by_type(db: Session, product_type: str):
-    return db.query(Product).filter(Product.type == product_type).all()
 
+async def stream_catalog_rows(db: AsyncSession, batch_size: int = 1000):
+    """Products joined with their plant, guide and accessory columns
 
-def get_products_in_stock(db: Session):
-    return db.query(Product).filter(Product.stock > 0).all()
+    Rows come from a server-side cursor ``batch_size`` at a time, as plain
+    tuples rather than ORM objects, so memory stays flat for any catalog size.
+    """
+    query = (
+        select(
+            Product.id,
+            Product.name,
+            Product.price,
+            Product.description,
+            Product.stock,
+            Product.type,
+            Plant.category,
+            Plant.water,
+            Plant.light,
+            Plant.soil_type,
+            Plant.size.label("plant_size"),
+            PlantGuide.how_to_plant,
+            PlantGuide.care_guide,
+            Accessory.size.label("accessory_size"),
+            Accessory.color,
+        )
+        .outerjoin(Plant, Plant.id == Product.id)
+        .outerjoin(PlantGuide, PlantGuide.id == Product.id)
+        .outerjoin(Accessory, Accessory.id == Product.id)
+        .order_by(Product.id)
+        .execution_options(stream_results=True, yield_per=batch_size)
+    )
+    return await db.stream(query)
 
 
-def update_product(db: Session, product_id: str, product: ProductUpdate):
-    db_product = get_product(db, product_id)
+async def get_product_by_name(db: AsyncSession, product_name: str):
+    result = await db.execute(select(Product).filter(Product.name == product_name))
+    return result.scalars().first()
+
+
+def _search_score(dialect: str, terms: Sequence[str]):
+    """Relevance score (higher is better) and match condition for ``terms``"""
+    if dialect == "postgresql":
+        # Spelled exactly like the ix_products_search_text expression
+        document = literal_column(
+            "to_tsvector('english', coalesce(products.search_text, ''))"
+        )
+        tsquery = func.websearch_to_tsquery(
+            literal_column("'english'"), " ".join(terms)
+        )
+        return func.ts_rank(document, tsquery), document.op("@@")(tsquery)
+
+    if dialect == "mysql":
+        score = match(Product.search_text, against=" ".join(terms))
+        score = score.in_natural_language_mode()
+        return score, score > 0
+
+    # SQLite FTS5; bm25() is lower-is-better
+    fts = literal_column("products_fts")
+    fts_query = " ".join(f'"{term}"' for term in terms)
+    return -func.bm25(fts), fts.op("MATCH")(fts_query)
+
+
+async def search_products(
+    db: AsyncSession,
+    query: str,
+    limit: int = 20,
+    after: Optional[Sequence] = None,
+    expand: Iterable[str] = (),
+):
+    """Products matching ``query`` with their relevance score, best first
+
+    ``after`` is the (score, id) of the previous page's last result.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    dialect = db.get_bind().dialect.name
+    score, matches = _search_score(dialect, terms)
+    ranked = select(Product.id, score.label("score")).filter(matches)
+    if dialect == "sqlite":
+        fts = table("products_fts", column("product_id"))
+        ranked = ranked.join(fts, fts.c.product_id == Product.id)
+    ranked = ranked.subquery()
+
+    statement = (
+        select(Product, ranked.c.score)
+        .join(ranked, ranked.c.id == Product.id)
+        .order_by(ranked.c.score.desc(), Product.id)
+    )
+    if after is not None:
+        last_score, last_id = after
+        statement = statement.filter(
+            or_(
+                ranked.c.score < last_score,
+                and_(ranked.c.score == last_score, Product.id > last_id),
+            )
+        )
+
+    options = _expand_options(expand)
+    if options:
+        statement = statement.options(*options).execution_options(
+            populate_existing=True
+        )
+
+    result = await db.execute(statement.limit(min(limit, MAX_PRODUCT_ROWS)))
+    return result.all()
+
+
+async def get_products_by_type(
+    db: AsyncSession, product_type: str, limit: int = MAX_PRODUCT_ROWS
+):
+    return await get_all_products(db, limit=limit, product_type=product_type)
+
+
+async def get_products_in_stock(db: AsyncSession, limit: int = MAX_PRODUCT_ROWS):
+    return await get_all_products(db, limit=limit, in_stock=True)
+
+
+async def update_product(db: AsyncSession, product_id: str, product: ProductUpdate):
+    db_product = await get_product(db, product_id)
     if db_product:
         for key, value in product.dict(exclude_unset=True).items():
             setattr(db_product, key, value)
-        db.commit()
-        db.refresh(db_product)
+        await refresh_search_text(db, product_id)
+        await db.commit()
+        await db.refresh(db_product)
+        catalog_cache.invalidate()
     return db_product
 
 
-def update_product_stock(db: Session, product_id: str, stock_change: int):
-    db_product = get_product(db, product_id)
-    if db_product:
-        db_product.stock += stock_change
-        db.commit()
-        db.refresh(db_product)
-    return db_product
+def _stock_update(new_stock):
+    # Core UPDATEs bypass version_id_col, so bump the row version by hand
+    return (
+        update(Product)
+        .values(
+            stock=new_stock,
+            version=Product.version + 1,
+            updated_at=datetime.utcnow(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def update_product_stock(db: AsyncSession, product_id: str, stock_change: int):
+    """Apply ``stock_change`` in one guarded UPDATE
+
+    Returns None if the product doesn't exist or the change would take its
+    stock below zero.
+    """
+    result = await db.execute(
+        _stock_update(Product.stock + stock_change).where(
+            Product.id == product_id, Product.stock + stock_change >= 0
+        )
+    )
+    if result.rowcount != 1:
+        await db.rollback()
+        return None
+
+    await db.commit()
+    if stock_change > 0:
+        # A restocked product can join in_stock listings it isn't cached in
+        catalog_cache.invalidate()
+    else:
+        catalog_cache.invalidate_rows([product_id])
+
+    # The UPDATE didn't touch any Product already in the session
+    result = await db.execute(
+        select(Product)
+        .filter(Product.id == product_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
+
+async def reserve_stock(
+    db: AsyncSession, quantities: Mapping[str, int], commit: bool = True
+) -> List[Dict]:
+    """Take stock for every item of a cart at once, or for none of them
+
+    A single ``UPDATE ... SET stock = stock - n WHERE id = ? AND stock >= n``
+    covers all items, so concurrent checkouts only contend on the rows they
+    share and stock can't go negative. Returns the items that were short
+    (empty only when everything was reserved); on shortage the transaction
+    is rolled back and nothing is taken.
+
+    With ``commit=False`` the caller commits and must then call
+    ``catalog_cache.invalidate_rows`` for the reserved products.
+    """
+    quantities = {product_id: n for product_id, n in quantities.items() if n > 0}
+    if not quantities:
+        return []
+
+    requested = case(quantities, value=Product.id)
+    query = _stock_update(Product.stock - requested).where(
+        Product.id.in_(quantities), Product.stock >= requested
+    )
+
+    dialect = db.get_bind().dialect
+    if dialect.update_returning:
+        result = await db.execute(query.returning(Product.id))
+        reserved = set(result.scalars().all())
+    else:
+        result = await db.execute(query)
+        reserved = set(quantities) if result.rowcount == len(quantities) else None
+
+    if reserved is not None and len(reserved) == len(quantities):
+        if commit:
+            await db.commit()
+            # Lower stock only changes the cached entries holding these rows
+            catalog_cache.invalidate_rows(quantities)
+        return []
+
+    await db.rollback()
+
+    # The UPDATE decides what was short; stock read afterwards may already
+    # have been restocked and must not turn a failed reservation into []
+    if reserved is not None:
+        short_ids = [
+            product_id for product_id in quantities if product_id not in reserved
+        ]
+    else:
+        short_ids = list(quantities)
+
+    # Only the failure path pays for reading current stock
+    result = await db.execute(
+        select(Product.id, Product.stock).filter(Product.id.in_(short_ids))
+    )
+    available = dict(result.all())
+    if reserved is None:
+        # rowcount can't say which rows missed; narrow down by current stock
+        # unless a concurrent restock has already covered all of them
+        still_short = [
+            product_id
+            for product_id in short_ids
+            if available.get(product_id) is None
+            or available[product_id] < quantities[product_id]
+        ]
+        short_ids = still_short or short_ids
+
+    return [
+        {
+            "product_id": product_id,
+            "requested": quantities[product_id],
+            "available": available.get(product_id),
+        }
+        for product_id in short_ids
+    ]
 
 
-def delete_product(db: Session, product_id: str):
-    db_product = get_product(db, product_id)
+async def delete_product(db: AsyncSession, product_id: str):
+    db_product = await get_product(db, product_id)
     if db_product:
-        db.delete(db_product)
-        db.commit()
+        await db.delete(db_product)
+        await db.commit()
+        catalog_cache.invalidate()
     return db_product
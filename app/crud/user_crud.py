@@ -1,13 +1,37 @@
-from sqlalchemy.orm import Session
+import os
+import tempfile
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user_model import User
-from app.schemas.auth_schema import UserCreate, UserUpdate
-from app.services import get_password_hash
+from app.schemas.auth_schema import UserCreate, UserResponse, UserUpdate
+from app.services import get_password_hash_async
+from app.cache import KeyedCache, SharedGeneration, TTLCache
 from uuid import uuid4
 
+# Authenticated users keyed by user id (the token "sub"); 0 disables caching.
+# Updates and deletes invalidate the user in every worker on this host.
+user_cache = KeyedCache(
+    TTLCache(
+        maxsize=int(os.getenv("USER_CACHE_SIZE", "1024")),
+        ttl=float(os.getenv("USER_CACHE_TTL", "60")),
+    ),
+    SharedGeneration(
+        os.getenv(
+            "USER_CACHE_GENERATION_FILE",
+            os.path.join(tempfile.gettempdir(), "leafify-user-generations"),
+        ),
+        slots=int(os.getenv("USER_CACHE_SLOTS", "4096")),
+    ),
+)
 
-def create_user(db: Session, user: UserCreate):
-    hashed_password = get_password_hash(user.password)
-    print(hashed_password)  # optional, for debugging
+
+def user_snapshot(db_user: User) -> UserResponse:
+    """What get_current_user caches and returns: the profile without the hash"""
+    return UserResponse.model_validate(db_user)
+
+
+async def create_user(db: AsyncSession, user: UserCreate):
+    hashed_password = await get_password_hash_async(user.password)
 
     db_user = User(
         name=user.name,
@@ -18,37 +42,49 @@ def create_user(db: Session, user: UserCreate):
     )
 
     db.add(db_user)
-    db.commit()
+    await db.commit()
 
-    db.refresh(db_user)
+    await db.refresh(db_user)
     return db_user
 
 
-def get_all_users(db: Session):
-    return db.query(User).all()
+async def get_all_users(db: AsyncSession):
+    result = await db.execute(select(User))
+    return result.scalars().all()
 
 
-def get_user(db: Session, user_id: int):
-    return db.query(User).filter(User.id == user_id).first()
+async def get_user(db: AsyncSession, user_id: int):
+    result = await db.execute(select(User).filter(User.id == user_id))
+    return result.scalars().first()
 
 
-def get_user_by_email(db: Session, email: str):
-    return db.query(User).filter(User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(User).filter(User.email == email))
+    return result.scalars().first()
 
 
-def update_user(db: Session, user_id: int, user: UserUpdate):
-    db_user = get_user(db, user_id)
+async def update_user(db: AsyncSession, user_id: int, user: UserUpdate):
+    db_user = await get_user(db, user_id)
     if db_user:
         for key, value in user.dict(exclude_unset=True).items():
             setattr(db_user, key, value)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
+        user_cache.invalidate(db_user.id)
+    return db_user
+
+
+async def update_user_password_hash(db: AsyncSession, db_user: User, new_hash: str):
+    db_user.password = new_hash
+    await db.commit()
+    user_cache.invalidate(db_user.id)
     return db_user
 
 
-def delete_user(db: Session, user_id: int):
-    db_user = get_user(db, user_id)
+async def delete_user(db: AsyncSession, user_id: int):
+    db_user = await get_user(db, user_id)
     if db_user:
-        db.delete(db_user)
-        db.commit()
+        await db.delete(db_user)
+        await db.commit()
+        user_cache.invalidate(db_user.id)
     return db_user
@@ -0,0 +1,159 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal
+
+STATS_TABLES = (
+    "users",
+    "products",
+    "plants",
+    "accessories",
+    "plant_guides",
+    "orders",
+)
+
+# Seconds a snapshot is served before a poll triggers a background refresh
+DB_STATS_TTL = float(os.getenv("DB_STATS_TTL", "60"))
+
+_POSTGRES_ESTIMATES = text(
+    "SELECT c.relname, c.reltuples::bigint, pg_database_size(current_database()) "
+    "FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+    "WHERE n.nspname = current_schema() AND c.relkind = 'r' "
+    "AND c.relname IN :tables"
+).bindparams(bindparam("tables", expanding=True))
+
+_MYSQL_ESTIMATES = text(
+    "SELECT table_name, table_rows, data_length + index_length "
+    "FROM information_schema.tables "
+    "WHERE table_schema = DATABASE() AND table_name IN :tables"
+).bindparams(bindparam("tables", expanding=True))
+
+
+def _size_mb(size_bytes) -> Optional[float]:
+    if size_bytes is None:
+        return None
+    return round(int(size_bytes) / (1024 * 1024), 2)
+
+
+async def exact_counts(db: AsyncSession) -> Dict[str, int]:
+    # One round trip instead of a COUNT(*) per table
+    query = " UNION ALL ".join(
+        f"SELECT '{table}', COUNT(*) FROM {table}" for table in STATS_TABLES
+    )
+    result = await db.execute(text(query))
+    return {table: count for table, count in result.all()}
+
+
+async def database_size_mb(db: AsyncSession) -> Optional[float]:
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        query = "SELECT pg_database_size(current_database())"
+    elif dialect in ("mysql", "mariadb"):
+        query = (
+            "SELECT SUM(data_length + index_length) FROM information_schema.tables "
+            "WHERE table_schema = DATABASE()"
+        )
+    elif dialect == "sqlite":
+        query = (
+            "SELECT page_count * page_size "
+            "FROM pragma_page_count(), pragma_page_size()"
+        )
+    else:
+        return None
+    result = await db.execute(text(query))
+    return _size_mb(result.scalar())
+
+
+async def estimated_stats(db: AsyncSession) -> Dict[str, Optional[float]]:
+    """Row counts from the planner's statistics; no table is scanned
+
+    SQLite keeps no such statistics, so it counts exactly (its tables are
+    local and small).
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        result = await db.execute(_POSTGRES_ESTIMATES, {"tables": STATS_TABLES})
+        rows = result.all()
+        # reltuples is -1 until the table is first vacuumed or analyzed
+        stats = {
+            name: (estimate if estimate >= 0 else None) for name, estimate, _ in rows
+        }
+        stats["database_size_mb"] = _size_mb(rows[0][2]) if rows else None
+    elif dialect in ("mysql", "mariadb"):
+        result = await db.execute(_MYSQL_ESTIMATES, {"tables": STATS_TABLES})
+        rows = result.all()
+        stats = {name: table_rows for name, table_rows, _ in rows}
+        stats["database_size_mb"] = _size_mb(sum(size or 0 for *_, size in rows))
+    else:
+        stats = await exact_counts(db)
+        stats["database_size_mb"] = await database_size_mb(db)
+
+    for table in STATS_TABLES:
+        stats.setdefault(table, None)
+    return stats
+
+
+async def exact_stats(db: AsyncSession) -> Dict[str, Optional[float]]:
+    stats = await exact_counts(db)
+    stats["database_size_mb"] = await database_size_mb(db)
+    return stats
+
+
+class StatsSnapshot:
+    """Statistics served from memory, refreshed in the background once stale
+
+    Only the first poll ever waits for the database; after that a stale
+    snapshot is returned while a single refresh runs behind it.
+    """
+
+    def __init__(self, collect, ttl: float = DB_STATS_TTL):
+        self.collect = collect
+        self.ttl = ttl
+        self.statistics: Optional[Dict] = None
+        self.taken_at: Optional[datetime] = None
+        self._taken_monotonic = 0.0
+        self.last_error: Optional[str] = None
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def _load(self):
+        async with AsyncSessionLocal() as db:
+            self.statistics = await self.collect(db)
+        self.taken_at = datetime.utcnow()
+        self._taken_monotonic = time.monotonic()
+        self.last_error = None
+
+    async def refresh(self):
+        async with self._lock:
+            try:
+                await self._load()
+            except Exception as e:
+                # Keep serving the previous snapshot; the error is reported
+                self.last_error = str(e)
+
+    def age_seconds(self) -> Optional[float]:
+        if self.taken_at is None:
+            return None
+        return round(time.monotonic() - self._taken_monotonic, 3)
+
+    async def get(self) -> Dict:
+        if self.statistics is None:
+            # Concurrent first polls share one load
+            async with self._lock:
+                if self.statistics is None:
+                    await self._load()
+        elif self.age_seconds() >= self.ttl and (
+            self._refresh_task is None or self._refresh_task.done()
+        ):
+            self._refresh_task = asyncio.create_task(self.refresh())
+        return self.statistics
+
+
+estimated_snapshot = StatsSnapshot(estimated_stats)
+exact_snapshot = StatsSnapshot(exact_stats)
@@ -0,0 +1,123 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response, status
+
+# (id, version, updated_at) of every row that went into a representation
+RowVersion = Tuple[Any, int, Optional[datetime]]
+
+# Payload keys holding embedded catalog rows; guide documents are never walked
+NESTED_ROW_KEYS = ("plant", "plant_guide", "accessory")
+
+
+def row_versions(payload: Any) -> List[RowVersion]:
+    """Collect row versions from a cached payload in serialization order"""
+    versions = []
+    if isinstance(payload, list):
+        for item in payload:
+            versions.extend(row_versions(item))
+    elif isinstance(payload, dict):
+        if "version" in payload:
+            versions.append(
+                (payload.get("id"), payload["version"], payload.get("updated_at"))
+            )
+        for key in NESTED_ROW_KEYS:
+            if payload.get(key) is not None:
+                versions.extend(row_versions(payload[key]))
+    return versions
+
+
+def model_versions(*objs) -> List[RowVersion]:
+    return [(obj.id, obj.version, obj.updated_at) for obj in objs if obj is not None]
+
+
+def make_etag(versions: Iterable[RowVersion]) -> str:
+    raw = "|".join(f"{row_id}:{version}" for row_id, version, _ in versions)
+    return '"' + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20] + '"'
+
+
+def last_modified(versions: List[RowVersion]) -> Optional[datetime]:
+    # Lists and expanded products can change by losing a row, which no
+    # remaining timestamp shows, so only single-row representations get one
+    if len(versions) != 1 or versions[0][2] is None:
+        return None
+    return versions[0][2].replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def encoded_etag(etag: str, coding: str) -> str:
+    """ETag of the ``coding``-encoded variant: each coding is its own
+    representation, so it gets its own strong validator"""
+    return f'{etag[:-1]}-{coding}"'
+
+
+def _strip_coding(tag: str) -> str:
+    # Validators are computed for the unencoded representation
+    for coding in ("gzip", "br"):
+        suffix = f'-{coding}"'
+        if tag.endswith(suffix):
+            return tag[: -len(suffix)] + '"'
+    return tag
+
+
+def _etag_list(header: str) -> List[str]:
+    return [_strip_coding(tag.strip()) for tag in header.split(",") if tag.strip()]
+
+
+def is_conditional(request: Request) -> bool:
+    headers = request.headers
+    return "if-none-match" in headers or "if-modified-since" in headers
+
+
+def not_modified(request: Request, versions: List[RowVersion]) -> bool:
+    """Evaluate If-None-Match (weak comparison), else If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        etag = make_etag(versions)
+        return any(tag.removeprefix("W/") == etag for tag in _etag_list(if_none_match))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    modified = last_modified(versions)
+    if if_modified_since and modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return modified <= since
+
+    return False
+
+
+def set_validators(response: Response, versions: List[RowVersion]):
+    response.headers["ETag"] = make_etag(versions)
+    modified = last_modified(versions)
+    if modified is not None:
+        response.headers["Last-Modified"] = format_datetime(modified, usegmt=True)
+
+
+def not_modified_response(versions: List[RowVersion]) -> Response:
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_validators(response, versions)
+    return response
+
+
+def precondition_failed() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="Resource was modified by another request",
+    )
+
+
+def check_if_match(request: Request, versions: List[RowVersion]):
+    """Reject a write whose If-Match no longer names the current representation"""
+    if_match = request.headers.get("if-match")
+    if if_match is None or if_match.strip() == "*":
+        return
+
+    if make_etag(versions) not in _etag_list(if_match):
+        raise precondition_failed()
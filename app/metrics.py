@@ -0,0 +1,37 @@
+import threading
+from bisect import bisect_left
+from typing import Dict, Sequence
+
+# Default latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative bucket histogram, safe to observe from worker threads"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+
+        cumulative, running = {}, 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            running += bucket_count
+            cumulative[str(bound)] = running
+        cumulative["+Inf"] = count
+
+        return {"buckets": cumulative, "sum": round(total, 6), "count": count}
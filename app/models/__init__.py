@@ -4,4 +4,4 @@ from .order_model import *
 from .plant_model import *
 from .accesories_model import *
 
-__all__ = [ 'User', 'Order', 'Product', 'Plant', 'Accessory', 'PlantGuide']
\ No newline at end of file
+__all__ = [ 'User', 'Order', 'OrderItem', 'UserOrderSummary', 'Product', 'Plant', 'Accessory', 'PlantGuide']
\ No newline at end of file
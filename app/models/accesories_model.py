@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, ForeignKey
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, String, ForeignKey
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -7,8 +8,15 @@ class Accessory(Base):
     __tablename__ = "accessories"
 
     id = Column(String(255), ForeignKey("products.id"), primary_key=True)
-    size = Column(String(255), nullable=False)
-    color = Column(String(255), nullable=False)
+    size = Column(String(255), nullable=False, index=True)
+    color = Column(String(255), nullable=False, index=True)
+
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(
+        DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+    __mapper_args__ = {"version_id_col": version}
 
     # Relationships
     product = relationship("Product", back_populates="accessory")
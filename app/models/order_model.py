@@ -1,5 +1,18 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
-from sqlalchemy.orm import relationship
+from datetime import datetime
+from sqlalchemy import (
+    DDL,
+    Column,
+    DateTime,
+    Integer,
+    String,
+    Float,
+    ForeignKey,
+    Index,
+    Text,
+    event,
+    inspect,
+)
+from sqlalchemy.orm import deferred, relationship
 from database import Base
 
 
@@ -7,18 +20,39 @@ class Product(Base):
     __tablename__ = "products"
 
     id = Column(String(255), primary_key=True)
-    name = Column(String(255), nullable=False)
-    price = Column(Float, nullable=False)
+    name = Column(String(255), nullable=False, unique=True, index=True)
+    price = Column(Float, nullable=False, index=True)
     description = Column(String(255), nullable=True)
-    stock = Column(Integer, default=0)
+    stock = Column(Integer, default=0, index=True)
     type = Column(String(255), nullable=False)  # 'plant' or 'accessory'
+    # Name, description, plant/accessory attributes and guide text for search;
+    # only ever read by the full-text index, so never loaded with the row
+    search_text = deferred(Column(Text, nullable=True))
+
+    # Bumped on every ORM update; backs ETags and optimistic locking
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(
+        DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+    # Listing filters combine type with stock or a price range
+    __table_args__ = (
+        Index("ix_products_type_stock", "type", "stock"),
+        Index("ix_products_type_price", "type", "price"),
+    )
+
+    __mapper_args__ = {"version_id_col": version}
 
     # Relationships
     plant = relationship("Plant", back_populates="product", uselist=False)
     accessory = relationship("Accessory", back_populates="product", uselist=False)
 
     def to_dict(self):
-        """Convert Product model to dictionary matching ProductResponse schema"""
+        """Convert Product model to dictionary matching ProductDetailResponse schema
+
+        Only relationships that were eager-loaded are included, so this never
+        issues a lazy-load query.
+        """
         result = {
             "id": self.id,
             "name": self.name,
@@ -26,54 +60,129 @@ class Product(Base):
             "description": self.description,
             "stock": self.stock,
             "type": self.type,
+            "version": self.version,
+            "updated_at": self.updated_at,
             "plant": None,
             "accessory": None,
         }
 
+        unloaded = inspect(self).unloaded
+
         # Add plant data if relationship is loaded and exists
-        if self.plant is not None:
-            result["plant"] = (
-                self.plant.to_dict()
-                if hasattr(self.plant, "to_dict")
-                else {
-                    "id": self.plant.id,
-                    "category": self.plant.category,
-                    "water": self.plant.water,
-                    "light": self.plant.light,
-                    "soil_type": self.plant.soil_type,
-                    "size": self.plant.size,
-                    # Add plant_guide if it exists
-                    "plant_guide": (
-                        self.plant.plant_guide.to_dict()
-                        if self.plant.plant_guide
-                        and hasattr(self.plant.plant_guide, "to_dict")
-                        else None
-                    ),
-                }
-            )
-
-        if self.accessory is not None:
-            result["accessory"] = (
-                self.accessory.to_dict()
-                if hasattr(self.accessory, "to_dict")
-                else {
-                    "id": self.accessory.id,
-                    "color": self.accessory.color,
-                    "size": self.accessory.size,
+        if "plant" not in unloaded and self.plant is not None:
+            plant = self.plant
+            result["plant"] = {
+                "id": plant.id,
+                "category": plant.category,
+                "water": plant.water,
+                "light": plant.light,
+                "soil_type": plant.soil_type,
+                "size": plant.size,
+                "version": plant.version,
+                "updated_at": plant.updated_at,
+                "plant_guide": None,
+            }
+
+            # Add plant_guide if it was loaded and exists
+            guide_loaded = "plant_guide" not in inspect(plant).unloaded
+            if guide_loaded and plant.plant_guide is not None:
+                result["plant"]["plant_guide"] = {
+                    "id": plant.plant_guide.id,
+                    "how_to_plant": plant.plant_guide.how_to_plant,
+                    "care_guide": plant.plant_guide.care_guide,
+                    "version": plant.plant_guide.version,
+                    "updated_at": plant.plant_guide.updated_at,
                 }
-            )
+
+        if "accessory" not in unloaded and self.accessory is not None:
+            result["accessory"] = {
+                "id": self.accessory.id,
+                "color": self.accessory.color,
+                "size": self.accessory.size,
+                "version": self.accessory.version,
+                "updated_at": self.accessory.updated_at,
+            }
 
         return result
 
 
+# The full-text index on search_text is dialect specific, so it's created
+# with DDL instead of an Index. SQLite (local runs) uses an FTS5 table kept in
+# sync by triggers; recreating products in a batch migration drops them.
+SEARCH_INDEX_DDL = {
+    "postgresql": [
+        "CREATE INDEX ix_products_search_text ON products "
+        "USING gin (to_tsvector('english', coalesce(search_text, '')))",
+    ],
+    "mysql": [
+        "CREATE FULLTEXT INDEX ix_products_search_text ON products (search_text)",
+    ],
+    "sqlite": [
+        "CREATE VIRTUAL TABLE products_fts USING fts5(product_id UNINDEXED, search_text)",
+        "CREATE TRIGGER products_fts_insert AFTER INSERT ON products BEGIN "
+        "INSERT INTO products_fts (product_id, search_text) "
+        "VALUES (new.id, new.search_text); END",
+        "CREATE TRIGGER products_fts_update AFTER UPDATE OF search_text ON products "
+        "BEGIN DELETE FROM products_fts WHERE product_id = old.id; "
+        "INSERT INTO products_fts (product_id, search_text) "
+        "VALUES (new.id, new.search_text); END",
+        "CREATE TRIGGER products_fts_delete AFTER DELETE ON products BEGIN "
+        "DELETE FROM products_fts WHERE product_id = old.id; END",
+    ],
+}
+
+for _dialect, _statements in SEARCH_INDEX_DDL.items():
+    for _statement in _statements:
+        event.listen(
+            Product.__table__,
+            "after_create",
+            DDL(_statement).execute_if(dialect=_dialect),
+        )
+
+
 class Order(Base):
     __tablename__ = "orders"
 
     id = Column(String(255), primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    products = Column(String(255), nullable=False)  # Could be JSON for product IDs
+    # Legacy blob of product ids; order_items is the source of truth
+    products = Column(String(255), nullable=True)
     total_price = Column(Float, nullable=False)
-    transac_id = Column(String(255), nullable=False)
+    transac_id = Column(String(255), nullable=False, index=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    # A user's orders are listed newest first
+    __table_args__ = (Index("ix_orders_user_id_created_at", "user_id", "created_at"),)
 
     # Relationships
     user = relationship("User", back_populates="orders")
+    items = relationship(
+        "OrderItem", back_populates="order", cascade="all, delete-orphan"
+    )
+
+
+class OrderItem(Base):
+    __tablename__ = "order_items"
+
+    # Checkout merges repeated products, so (order, product) is unique. No
+    # generated key means the ORM can insert an order's items in one batch.
+    order_id = Column(String(255), ForeignKey("orders.id"), primary_key=True)
+    product_id = Column(String(255), ForeignKey("products.id"), primary_key=True)
+    quantity = Column(Integer, nullable=False)
+    unit_price = Column(Float, nullable=False)  # Price at checkout time
+
+    __table_args__ = (Index("ix_order_items_product_id", "product_id"),)
+
+    # Relationships
+    order = relationship("Order", back_populates="items")
+
+
+class UserOrderSummary(Base):
+    """Running order totals per user, maintained at checkout"""
+
+    __tablename__ = "user_order_summaries"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    total_spent = Column(Float, nullable=False, default=0)
+    last_order_at = Column(DateTime, nullable=True)
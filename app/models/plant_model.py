@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, ForeignKey, JSON
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, String, ForeignKey, JSON
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -7,11 +8,18 @@ class Plant(Base):
     __tablename__ = "plants"
 
     id = Column(String(255), ForeignKey("products.id"), primary_key=True)
-    category = Column(String(255), nullable=False)
-    water = Column(String(255), nullable=False)
-    light = Column(String(255), nullable=False)
+    category = Column(String(255), nullable=False, index=True)
+    water = Column(String(255), nullable=False, index=True)
+    light = Column(String(255), nullable=False, index=True)
     soil_type = Column(String(255), nullable=False)
-    size = Column(String(255), nullable=False)
+    size = Column(String(255), nullable=False, index=True)
+
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(
+        DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+    __mapper_args__ = {"version_id_col": version}
 
     # Relationships
     product = relationship("Product", back_populates="plant")
@@ -25,5 +33,12 @@ class PlantGuide(Base):
     how_to_plant = Column(JSON, nullable=False)
     care_guide = Column(JSON, nullable=False)
 
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(
+        DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+    __mapper_args__ = {"version_id_col": version}
+
     # Relationships
     plant = relationship("Plant", back_populates="plant_guide")
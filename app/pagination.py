@@ -0,0 +1,46 @@
+import base64
+import json
+from typing import Any, List, Optional
+
+from fastapi import HTTPException, Response, status
+
+# Response header carrying the cursor for the next keyset page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode the sort key of the last row into an opaque, URL-safe cursor"""
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], size: int = 1) -> Optional[List[Any]]:
+    if not cursor:
+        return None
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        values = None
+
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+    return values
+
+
+def set_next_cursor(response: Response, rows: List[Any], limit: int, *key_attrs: str):
+    """Advertise the next page when this one came back full"""
+    if not rows or len(rows) < limit:
+        return None
+
+    last = rows[-1]
+    if isinstance(last, dict):
+        next_cursor = encode_cursor(*(last[attr] for attr in key_attrs))
+    else:
+        next_cursor = encode_cursor(*(getattr(last, attr) for attr in key_attrs))
+    response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return next_cursor
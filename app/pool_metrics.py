@@ -0,0 +1,96 @@
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.metrics import Histogram
+
+# Checkout waits and connects in seconds; the top bucket covers pool_timeout
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0)
+
+
+class PoolMetrics:
+    """Counters and histograms fed by InstrumentedAsyncQueuePool and pool events"""
+
+    def __init__(self):
+        self.checkout_wait_seconds = Histogram(buckets=POOL_WAIT_BUCKETS)
+        self.connect_seconds = Histogram(buckets=POOL_WAIT_BUCKETS)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.pings = 0
+        self.disconnects = 0
+
+    def snapshot(self, pool) -> dict:
+        return {
+            "pool_class": type(pool).__name__,
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            # overflow() counts down from -size while the core pool fills
+            "overflow_in_use": max(0, pool.overflow()),
+            "checkouts_total": self.checkouts,
+            "timeouts_total": self.timeouts,
+            "idle_pings_total": self.pings,
+            "disconnects_total": self.disconnects,
+            "checkout_wait_seconds": self.checkout_wait_seconds.snapshot(),
+            "connect_seconds": self.connect_seconds.snapshot(),
+        }
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that times every checkout, including waits for a
+    free connection and any checkout-time ping"""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            pool_metrics.timeouts += 1
+            raise
+        finally:
+            pool_metrics.checkouts += 1
+            pool_metrics.checkout_wait_seconds.observe(time.perf_counter() - start)
+
+
+def instrument_engine(sync_engine, ping_idle_seconds=None):
+    """Time new connections and, when ``ping_idle_seconds`` is set, ping only
+    connections that sat idle in the pool longer than that
+
+    Pinging every checkout (pool_pre_ping) costs a round trip per request;
+    connections returned moments ago are almost never dead.
+    """
+
+    @event.listens_for(sync_engine, "do_connect")
+    def _timed_connect(dialect, conn_rec, cargs, cparams):
+        start = time.perf_counter()
+        try:
+            return dialect.connect(*cargs, **cparams)
+        finally:
+            pool_metrics.connect_seconds.observe(time.perf_counter() - start)
+
+    @event.listens_for(sync_engine, "checkin")
+    def _mark_idle(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    if ping_idle_seconds is None:
+        return
+
+    @event.listens_for(sync_engine, "checkout")
+    def _ping_if_idle(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or (
+            time.monotonic() - checked_in_at < ping_idle_seconds
+        ):
+            return
+
+        pool_metrics.pings += 1
+        try:
+            sync_engine.dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            # The pool discards this connection and checks out another
+            pool_metrics.disconnects += 1
+            raise exc.DisconnectionError(str(e)) from e
@@ -0,0 +1,193 @@
+import logging
+import os
+import re
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    import greenlet
+except ImportError:  # only the async engine runs statements in a greenlet
+    greenlet = None
+
+logger = logging.getLogger(__name__)
+
+# "off", "log" (warn when a request goes over budget) or "raise" (fail it)
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "off").lower()
+# Budget for routes that don't declare one with @query_budget
+QUERY_BUDGET_DEFAULT = int(os.getenv("QUERY_BUDGET_DEFAULT", "20"))
+# A statement shape run at least this often is reported as a likely N+1
+QUERY_BUDGET_DUPLICATES = int(os.getenv("QUERY_BUDGET_DUPLICATES", "3"))
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_THIRD_PARTY = ("site-packages", "dist-packages", f"{os.sep}.venv{os.sep}")
+
+_SPACE_RE = re.compile(r"\s+")
+# Expanded IN lists differ only in how many placeholders they have
+_IN_LIST_RE = re.compile(
+    r"\(\s*(?:\?|%s|\$\d+|:\w+)(?:\s*,\s*(?:\?|%s|\$\d+|:\w+))+\s*\)"
+)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A request or block ran more SQL statements than its budget allows"""
+
+
+def statement_shape(statement: str) -> str:
+    shape = _SPACE_RE.sub(" ", statement).strip()
+    return _IN_LIST_RE.sub("(?, ...)", shape)
+
+
+def _stack():
+    frames = traceback.extract_stack()
+    # Under the async engine the statement runs in a greenlet; the code that
+    # awaited it is on the parent greenlet's stack
+    if greenlet is not None:
+        parent = greenlet.getcurrent().parent
+        if parent is not None and parent.gr_frame is not None:
+            frames = traceback.extract_stack(parent.gr_frame) + frames
+    return frames
+
+
+def call_site() -> str:
+    """Innermost frame in this project's own code that led to the statement"""
+    for frame in reversed(_stack()):
+        filename = frame.filename
+        if (
+            filename.startswith(_PROJECT_ROOT)
+            and not any(part in filename for part in _THIRD_PARTY)
+            and filename != __file__
+        ):
+            path = os.path.relpath(filename, _PROJECT_ROOT)
+            return f"{path}:{frame.lineno} in {frame.name}"
+    return "<unknown>"
+
+
+class QueryLog:
+    """Statements run during one request or test block, grouped by shape"""
+
+    def __init__(self, label: str, budget: int, parent: Optional["QueryLog"] = None):
+        self.label = label
+        self.budget = budget
+        # An enclosing test block also counts the requests made inside it
+        self.parent = parent
+        self.count = 0
+        self.shapes: Dict[str, Counter] = {}
+
+    def record(self, shape: str, site: str):
+        self.count += 1
+        self.shapes.setdefault(shape, Counter())[site] += 1
+        if self.parent is not None:
+            self.parent.record(shape, site)
+
+    @property
+    def over_budget(self) -> bool:
+        return self.count > self.budget
+
+    def duplicates(self) -> List[Tuple[str, int, Counter]]:
+        repeated = [
+            (shape, sum(sites.values()), sites)
+            for shape, sites in self.shapes.items()
+            if sum(sites.values()) >= QUERY_BUDGET_DUPLICATES
+        ]
+        return sorted(repeated, key=lambda item: -item[1])
+
+    def report(self) -> str:
+        lines = [f"{self.label} ran {self.count} SQL statements (budget {self.budget})"]
+        for shape, count, sites in self.duplicates():
+            lines.append(f"  {count}x {shape[:200]}")
+            for site, site_count in sites.most_common():
+                lines.append(f"      {site_count}x at {site}")
+        return "\n".join(lines)
+
+    def check(self, mode: str):
+        if mode == "off" or not self.over_budget:
+            return
+        if mode == "raise":
+            raise QueryBudgetExceeded(self.report())
+        logger.warning(self.report())
+
+
+current_query_log: ContextVar[Optional[QueryLog]] = ContextVar(
+    "current_query_log", default=None
+)
+
+
+def instrument_query_budget(sync_engine):
+    """Record statements for whichever QueryLog is active; a no-op otherwise"""
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _record_statement(conn, cursor, statement, parameters, context, executemany):
+        query_log = current_query_log.get()
+        if query_log is not None:
+            query_log.record(statement_shape(statement), call_site())
+
+
+def query_budget(max_queries: int):
+    """Declare how many SQL statements a route may run
+
+    Goes below the router decorator:
+
+        @router.get("/")
+        @query_budget(2)
+        async def get_things(...):
+    """
+
+    def decorate(endpoint):
+        endpoint.query_budget = max_queries
+        return endpoint
+
+    return decorate
+
+
+@contextmanager
+def assert_query_budget(max_queries: int, label: str = "block", mode: str = "raise"):
+    """Fail (or log) if the statements run inside the block exceed ``max_queries``
+
+    For tests: ``with assert_query_budget(3): await client.get(...)``. The
+    yielded QueryLog holds the count and shapes for further assertions.
+    """
+    query_log = QueryLog(label, max_queries, parent=current_query_log.get())
+    token = current_query_log.set(query_log)
+    try:
+        yield query_log
+    finally:
+        current_query_log.reset(token)
+    query_log.check(mode)
+
+
+class QueryBudgetMiddleware:
+    """Checks each request's statement count against its route's budget"""
+
+    def __init__(self, app: ASGIApp, mode: str = QUERY_BUDGET_MODE):
+        self.app = app
+        self.mode = mode
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or self.mode == "off":
+            await self.app(scope, receive, send)
+            return
+
+        query_log = QueryLog(
+            f"{scope['method']} {scope['path']}",
+            QUERY_BUDGET_DEFAULT,
+            parent=current_query_log.get(),
+        )
+        token = current_query_log.set(query_log)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_query_log.reset(token)
+
+        route = scope.get("route")
+        if route is not None:
+            query_log.label = f"{scope['method']} {route.path}"
+            query_log.budget = getattr(
+                route.endpoint, "query_budget", QUERY_BUDGET_DEFAULT
+            )
+        query_log.check(self.mode)
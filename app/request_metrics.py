@@ -0,0 +1,240 @@
+import json
+import os
+import tempfile
+import time
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.metrics import DEFAULT_BUCKETS, Histogram
+
+# Every worker writes its metrics here as <pid>.json; /metrics sums the files
+METRICS_DIR = os.getenv(
+    "METRICS_DIR", os.path.join(tempfile.gettempdir(), "leafify-metrics")
+)
+# Seconds between a worker's snapshot writes (a scrape always writes one)
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+RESPONSE_SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# Paths that matched no route share one label, so scanners can't add series
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class RequestStats:
+    """Database work done on behalf of the current request"""
+
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "current_request_stats", default=None
+)
+
+
+def instrument_queries(sync_engine):
+    """Attribute every statement run on ``sync_engine`` to the current request"""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started_at = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _record_query(conn, cursor, statement, parameters, context, executemany):
+        stats = current_request_stats.get()
+        if stats is None:
+            return
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - context._metrics_started_at
+
+
+# (help text, buckets) of each histogram, keyed by Prometheus metric name
+HISTOGRAMS = {
+    "http_request_duration_seconds": (
+        "Request latency by route",
+        DEFAULT_BUCKETS,
+    ),
+    "http_request_db_queries": (
+        "SQL statements executed per request",
+        QUERY_COUNT_BUCKETS,
+    ),
+    "http_request_db_seconds": (
+        "Time spent in SQL statements per request",
+        DEFAULT_BUCKETS,
+    ),
+    "http_response_size_bytes": (
+        "Response body size as sent (after compression)",
+        RESPONSE_SIZE_BUCKETS,
+    ),
+}
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+class RequestMetrics:
+    """Per-process histograms, persisted for cross-worker aggregation"""
+
+    def __init__(self, directory: str = METRICS_DIR):
+        self.directory = directory
+        self._series: Dict[Tuple[str, LabelSet], Histogram] = {}
+        self._last_flush = 0.0
+
+    def _histogram(self, name: str, labels: LabelSet) -> Histogram:
+        histogram = self._series.get((name, labels))
+        if histogram is None:
+            histogram = Histogram(buckets=HISTOGRAMS[name][1])
+            self._series[(name, labels)] = histogram
+        return histogram
+
+    def observe_request(
+        self,
+        method: str,
+        route: str,
+        status: int,
+        seconds: float,
+        stats: RequestStats,
+        response_bytes: int,
+    ):
+        labels = (("method", method), ("route", route))
+        self._histogram(
+            "http_request_duration_seconds", labels + (("status", str(status)),)
+        ).observe(seconds)
+        self._histogram("http_request_db_queries", labels).observe(stats.queries)
+        self._histogram("http_request_db_seconds", labels).observe(stats.db_seconds)
+        self._histogram("http_response_size_bytes", labels).observe(response_bytes)
+
+    def snapshot(self) -> List[Dict]:
+        return [
+            {"name": name, "labels": dict(labels), **histogram.snapshot()}
+            for (name, labels), histogram in self._series.items()
+        ]
+
+    def flush(self, force: bool = False):
+        """Write this worker's snapshot, at most every METRICS_FLUSH_INTERVAL"""
+        now = time.monotonic()
+        if not force and now - self._last_flush < METRICS_FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def _worker_snapshots(self) -> Iterable[List[Dict]]:
+        try:
+            filenames = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for filename in filenames:
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(
+                    os.path.join(self.directory, filename), encoding="utf-8"
+                ) as f:
+                    yield json.load(f)
+            except (OSError, ValueError):
+                continue  # a worker is mid-write or the file was just removed
+
+    def aggregate(self) -> Dict[Tuple[str, LabelSet], Dict]:
+        """Sum every worker's series, including workers that have since exited"""
+        totals: Dict[Tuple[str, LabelSet], Dict] = {}
+        for series_list in self._worker_snapshots():
+            for series in series_list:
+                key = (series["name"], tuple(sorted(series["labels"].items())))
+                total = totals.setdefault(key, {"buckets": {}, "sum": 0.0, "count": 0})
+                for bound, count in series["buckets"].items():
+                    total["buckets"][bound] = total["buckets"].get(bound, 0) + count
+                total["sum"] += series["sum"]
+                total["count"] += series["count"]
+        return totals
+
+    def render_prometheus(self) -> str:
+        self.flush(force=True)
+        totals = self.aggregate()
+        lines = []
+        for name, (help_text, _) in HISTOGRAMS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (series_name, labels), total in sorted(totals.items()):
+                if series_name != name:
+                    continue
+                for bound, count in total["buckets"].items():
+                    lines.append(
+                        f"{name}_bucket{_labels(labels + (('le', bound),))} {count}"
+                    )
+                lines.append(f"{name}_sum{_labels(labels)} {total['sum']}")
+                lines.append(f"{name}_count{_labels(labels)} {total['count']}")
+        return "\n".join(lines) + "\n"
+
+    def clear_directory(self):
+        """Drop snapshots from a previous run; called once by the gunicorn master"""
+        if not os.path.isdir(self.directory):
+            return
+        for filename in os.listdir(self.directory):
+            if filename.endswith((".json", ".tmp")):
+                os.remove(os.path.join(self.directory, filename))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: LabelSet) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+request_metrics = RequestMetrics()
+
+
+class RequestMetricsMiddleware:
+    """Records latency, DB statements, DB time and response size per route"""
+
+    def __init__(self, app: ASGIApp, metrics: RequestMetrics = request_metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        status = 500
+        response_bytes = 0
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request_stats.reset(token)
+            # The router leaves the matched route in the scope
+            route = scope.get("route")
+            self.metrics.observe_request(
+                scope["method"],
+                getattr(route, "path", UNMATCHED_ROUTE),
+                status,
+                time.perf_counter() - start,
+                stats,
+                response_bytes,
+            )
+            self.metrics.flush()
@@ -1,24 +1,34 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from jose import JWTError, jwt
-from app.models.user_model import User
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from app.schemas.auth_schema import UserCreate, UserUpdate, UserResponse, Token
 from app.crud.user_crud import *
-from app.services import ALGORITHM, SECRET_KEY, verify_password, create_access_token
-
+from app.services import (
+    PasswordHashingBusy,
+    create_access_token,
+    decode_access_token,
+    verify_and_update_password,
+)
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 
+def _hashing_busy():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many authentication requests, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+
 async def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)
 ):
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         user_id = payload.get("sub")
         if user_id is None:
             raise HTTPException(
@@ -26,14 +36,21 @@ async def get_current_user(
                 detail=f"Could not validate credentials, user_id none",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-    except (JWTError, ValueError, TypeError) as e:
+        # Async drivers (asyncpg) don't coerce the string claim to the int column
+        user_id = int(user_id)
+    except (ValueError, TypeError) as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Could not validate credentials,{e}",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = get_user(db, user_id=user_id)
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    generation = user_cache.generation(user_id)
+    user = await get_user(db, user_id=user_id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -41,62 +58,82 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    user = user_snapshot(user)
+    user_cache.set(user_id, user, generation)
     return user
 
 
 @router.post(
     "/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED
 )
-async def signup(user: UserCreate, db: Session = Depends(get_db)):
+async def signup(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Check if user already exists
-    db_user = get_user_by_email(db, email=user.email)
+    db_user = await get_user_by_email(db, email=user.email)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered"
         )
 
-    new_user = create_user(db=db, user=user)
+    try:
+        new_user = await create_user(db=db, user=user)
+    except PasswordHashingBusy:
+        raise _hashing_busy()
     return new_user
 
 
 @router.post("/login", response_model=Token)
 async def login(
-    form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    user = get_user_by_email(db, email=form_data.username)
+    user = await get_user_by_email(db, email=form_data.username)
 
     # Verify user exists and password is correct
-    if not user or not verify_password(form_data.password, user.password):
+    verified, new_hash = False, None
+    if user:
+        try:
+            verified, new_hash = await verify_and_update_password(
+                form_data.password, user.password
+            )
+        except PasswordHashingBusy:
+            raise _hashing_busy()
+
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    # Transparently upgrade hashes made with an older cost factor
+    if new_hash:
+        await update_user_password_hash(db, db_user=user, new_hash=new_hash)
+
     access_token = create_access_token(data={"sub": str(user.id)})
 
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(current_user: UserResponse = Depends(get_current_user)):
     return current_user
 
 
 @router.put("/me", response_model=UserResponse)
 async def update_current_user(
     user_update: UserUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     # Prevent updating email to an existing one
     if user_update.email and user_update.email != current_user.email:
-        existing_user = get_user_by_email(db, email=user_update.email)
+        existing_user = await get_user_by_email(db, email=user_update.email)
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, detail="Email already in use"
             )
 
-    updated_user = update_user(db=db, user_id=current_user.id, user=user_update)
+    updated_user = await update_user(db=db, user_id=current_user.id, user=user_update)
 
     if not updated_user:
         raise HTTPException(
@@ -108,9 +145,10 @@ async def update_current_user(
 
 @router.delete("/me", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_current_user(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    deleted_user = delete_user(db=db, user_id=current_user.id)
+    deleted_user = await delete_user(db=db, user_id=current_user.id)
 
     if not deleted_user:
         raise HTTPException(
@@ -0,0 +1,116 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+
+from database import get_async_db
+from app.query_budget import query_budget
+from app.schemas.auth_schema import UserResponse
+from app.routes.auth_route import get_current_user
+from app.schemas.order_schema import (
+    CheckoutConflict,
+    MonthlySpend,
+    OrderCreate,
+    OrderResponse,
+    OrderSummary,
+    ProductTypeSpend,
+)
+from app.crud.order_crud import (
+    MAX_ORDER_ROWS,
+    checkout_order,
+    get_order,
+    get_orders_by_user,
+    get_user_monthly_spend,
+    get_user_order_totals,
+    get_user_spend_by_product_type,
+)
+
+router = APIRouter(prefix="/orders", tags=["Orders"])
+
+
+# CHECKOUT
+@router.post(
+    "/checkout",
+    response_model=OrderResponse,
+    status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_409_CONFLICT: {"model": CheckoutConflict}},
+)
+@query_budget(10)
+async def checkout(
+    order: OrderCreate,
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Reserve stock for every item and create the order in one transaction;
+    if any item is short nothing is written and the short items are listed
+    """
+    db_order, short = await checkout_order(db, user_id=current_user.id, order=order)
+    if short:
+        return JSONResponse(
+            status_code=status.HTTP_409_CONFLICT,
+            content=CheckoutConflict(detail="Insufficient stock", short=short).dict(),
+        )
+
+    return db_order
+
+
+# GET MY ORDERS
+@router.get("/", response_model=List[OrderResponse])
+@query_budget(3)
+async def get_my_orders(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=MAX_ORDER_ROWS),
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await get_orders_by_user(db, user_id=current_user.id, skip=skip, limit=limit)
+
+
+# GET MY ORDER SUMMARY
+@router.get("/summary", response_model=OrderSummary)
+@query_budget(2)
+async def get_my_order_summary(
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await get_user_order_totals(db, user_id=current_user.id)
+
+
+# GET MY SPEND PER MONTH
+@router.get("/spend/monthly", response_model=List[MonthlySpend])
+@query_budget(2)
+async def get_my_monthly_spend(
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await get_user_monthly_spend(db, user_id=current_user.id)
+
+
+# GET MY SPEND PER PRODUCT TYPE
+@router.get("/spend/by-type", response_model=List[ProductTypeSpend])
+@query_budget(2)
+async def get_my_spend_by_type(
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await get_user_spend_by_product_type(db, user_id=current_user.id)
+
+
+# GET ORDER BY ID
+@router.get("/{order_id}", response_model=OrderResponse)
+@query_budget(3)
+async def get_order_by_id(
+    order_id: str,
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    order = await get_order(db, order_id=order_id)
+
+    # Don't reveal whether another user's order exists
+    if not order or order.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Order not found"
+        )
+
+    return order
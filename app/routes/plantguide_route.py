@@ -1,8 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from typing import List, Dict
-
-from database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
+from typing import List, Dict, Optional
+
+from database import get_async_db
+from app.pagination import decode_cursor, set_next_cursor
+from app.serialization import fast_json
+from app.query_budget import query_budget
+from app.http_cache import (
+    check_if_match,
+    is_conditional,
+    model_versions,
+    not_modified,
+    not_modified_response,
+    precondition_failed,
+    row_versions,
+    set_validators,
+)
 from app.schemas.plantguide_schema import (
     PlantGuideResponse,
     PlantGuideCreate,
@@ -10,31 +24,107 @@ from app.schemas.plantguide_schema import (
 )
 from app.crud.plantguide_crud import (
     create_plant_guide,
-    get_all_plant_guides,
     get_plant_guide,
+    get_plant_guide_versions,
+    merge_patch_plant_guide,
     update_plant_guide,
     delete_plant_guide,
 )
 from app.crud.plant_crud import get_plant
+from app.crud.catalog_cache_crud import (
+    get_cached_plant_guide,
+    get_cached_plant_guide_versions,
+    get_cached_plant_guides,
+)
 
 router = APIRouter(prefix="/plant-guides", tags=["Plant Guides"])
 
+# PATCH bodies sent with this type are RFC 7386 merge patches, not documents
+MERGE_PATCH_MEDIA_TYPE = "application/merge-patch+json"
+
+
+def is_merge_patch(request: Request) -> bool:
+    content_type = request.headers.get("content-type", "")
+    return content_type.split(";")[0].strip().lower() == MERGE_PATCH_MEDIA_TYPE
+
+
+async def merge_patch_section(
+    db: AsyncSession,
+    request: Request,
+    response: Response,
+    plant_id: str,
+    section: str,
+    patch: Dict,
+):
+    # Only the version columns are read; the documents never leave the database
+    versions = await get_plant_guide_versions(db, plant_id=plant_id)
+    if not versions:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Plant guide not found for plant ID: {plant_id}. Use POST to create a new guide.",
+        )
+
+    check_if_match(request, versions)
+
+    # With If-Match the write is conditional on the version that was checked
+    expected_version = versions[0][1] if "if-match" in request.headers else None
+    updated_guide = await merge_patch_plant_guide(
+        db,
+        plant_id=plant_id,
+        section=section,
+        patch=patch,
+        expected_version=expected_version,
+    )
+    if updated_guide is None:
+        raise precondition_failed()
+
+    set_validators(response, model_versions(updated_guide))
+    return updated_guide
+
 
 # GET ALL PLANT GUIDES
 @router.get("/", response_model=List[PlantGuideResponse])
+@query_budget(1)
 async def get_guides(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(
+        None, description="X-Next-Cursor of the previous page"
+    ),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    guides = get_all_plant_guides(db, skip=skip, limit=limit)
-    return guides
+    after = decode_cursor(cursor)
+    guides = await get_cached_plant_guides(
+        db, skip=skip, limit=limit, after=after[0] if after else None
+    )
+    set_next_cursor(response, guides, limit, "id")
+
+    versions = row_versions(guides)
+    if not_modified(request, versions):
+        return not_modified_response(versions)
+
+    set_validators(response, versions)
+    return fast_json(response, List[PlantGuideResponse], guides)
 
 
 # GET PLANT GUIDE BY PLANT ID
 @router.get("/{plant_id}", response_model=PlantGuideResponse)
-async def get_guide_by_plant_id(plant_id: str, db: Session = Depends(get_db)):
-    guide = get_plant_guide(db, plant_id=plant_id)
+@query_budget(2)
+async def get_guide_by_plant_id(
+    plant_id: str,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+):
+    # The guide documents are large; revalidate from the version columns only
+    if is_conditional(request):
+        versions = await get_cached_plant_guide_versions(db, plant_id=plant_id)
+        if versions and not_modified(request, versions):
+            return not_modified_response(versions)
+
+    guide = await get_cached_plant_guide(db, plant_id=plant_id)
 
     if not guide:
         raise HTTPException(
@@ -42,6 +132,7 @@ async def get_guide_by_plant_id(plant_id: str, db: Session = Depends(get_db)):
             detail=f"Plant guide not found for plant ID: {plant_id}",
         )
 
+    set_validators(response, row_versions(guide))
     return guide
 
 
@@ -50,16 +141,16 @@ async def get_guide_by_plant_id(plant_id: str, db: Session = Depends(get_db)):
     "/", response_model=PlantGuideResponse, status_code=status.HTTP_201_CREATED
 )
 async def create_complete_plant_guide(
-    plant_guide: PlantGuideCreate, db: Session = Depends(get_db)
+    plant_guide: PlantGuideCreate, db: AsyncSession = Depends(get_async_db)
 ):
-    plant = get_plant(db, plant_id=plant_guide.id)
+    plant = await get_plant(db, plant_id=plant_guide.id)
     if not plant:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Plant not found with ID: {plant_guide.id}",
         )
 
-    existing_guide = get_plant_guide(db, plant_id=plant_guide.id)
+    existing_guide = await get_plant_guide(db, plant_id=plant_guide.id)
     if existing_guide:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -79,7 +170,7 @@ async def create_complete_plant_guide(
             detail="care_guide must be a JSON object",
         )
 
-    new_guide = create_plant_guide(db=db, plant_guide=plant_guide)
+    new_guide = await create_plant_guide(db=db, plant_guide=plant_guide)
     return new_guide
 
 
@@ -90,9 +181,13 @@ async def create_complete_plant_guide(
     status_code=status.HTTP_201_CREATED,
 )
 async def create_how_to_plant_guide(
-    plant_id: str, how_to_plant: Dict, db: Session = Depends(get_db)
+    plant_id: str,
+    how_to_plant: Dict,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
 ):
-    plant = get_plant(db, plant_id=plant_id)
+    plant = await get_plant(db, plant_id=plant_id)
     if not plant:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -106,19 +201,25 @@ async def create_how_to_plant_guide(
             detail="how_to_plant must be a JSON object",
         )
 
-    existing_guide = get_plant_guide(db, plant_id=plant_id)
+    existing_guide = await get_plant_guide(db, plant_id=plant_id)
 
     if existing_guide:
+        check_if_match(request, model_versions(existing_guide))
         guide_update = PlantGuideUpdate(how_to_plant=how_to_plant)
-        updated_guide = update_plant_guide(
-            db=db, plant_id=plant_id, plant_guide=guide_update
-        )
+        try:
+            updated_guide = await update_plant_guide(
+                db=db, plant_id=plant_id, plant_guide=guide_update
+            )
+        except StaleDataError:
+            await db.rollback()
+            raise precondition_failed()
+        set_validators(response, model_versions(updated_guide))
         return updated_guide
     else:
         new_guide_data = PlantGuideCreate(
             id=plant_id, how_to_plant=how_to_plant, care_guide={}
         )
-        new_guide = create_plant_guide(db=db, plant_guide=new_guide_data)
+        new_guide = await create_plant_guide(db=db, plant_guide=new_guide_data)
         return new_guide
 
 
@@ -129,9 +230,13 @@ async def create_how_to_plant_guide(
     status_code=status.HTTP_201_CREATED,
 )
 async def create_care_guide(
-    plant_id: str, care_guide: Dict, db: Session = Depends(get_db)
+    plant_id: str,
+    care_guide: Dict,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
 ):
-    plant = get_plant(db, plant_id=plant_id)
+    plant = await get_plant(db, plant_id=plant_id)
     if not plant:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -145,34 +250,41 @@ async def create_care_guide(
             detail="care_guide must be a JSON object",
         )
 
-    existing_guide = get_plant_guide(db, plant_id=plant_id)
+    existing_guide = await get_plant_guide(db, plant_id=plant_id)
 
     if existing_guide:
+        check_if_match(request, model_versions(existing_guide))
         guide_update = PlantGuideUpdate(care_guide=care_guide)
-        updated_guide = update_plant_guide(
-            db=db, plant_id=plant_id, plant_guide=guide_update
-        )
+        try:
+            updated_guide = await update_plant_guide(
+                db=db, plant_id=plant_id, plant_guide=guide_update
+            )
+        except StaleDataError:
+            await db.rollback()
+            raise precondition_failed()
+        set_validators(response, model_versions(updated_guide))
         return updated_guide
     else:
         new_guide_data = PlantGuideCreate(
             id=plant_id, how_to_plant={}, care_guide=care_guide
         )
-        new_guide = create_plant_guide(db=db, plant_guide=new_guide_data)
+        new_guide = await create_plant_guide(db=db, plant_guide=new_guide_data)
         return new_guide
 
 
 # UPDATE HOW TO PLANT SECTION
 @router.patch("/{plant_id}/how-to-plant", response_model=PlantGuideResponse)
 async def update_how_to_plant_guide(
-    plant_id: str, how_to_plant: Dict, db: Session = Depends(get_db)
+    plant_id: str,
+    how_to_plant: Dict,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
 ):
-    existing_guide = get_plant_guide(db, plant_id=plant_id)
-    if not existing_guide:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Plant guide not found for plant ID: {plant_id}. Use POST to create a new guide.",
-        )
-
+    """
+    Replace the section, or send application/merge-patch+json to change
+    only the keys in the body (null removes a key)
+    """
     # Validate JSON structure
     if not isinstance(how_to_plant, dict):
         raise HTTPException(
@@ -180,25 +292,47 @@ async def update_how_to_plant_guide(
             detail="how_to_plant must be a JSON object",
         )
 
+    if is_merge_patch(request):
+        return await merge_patch_section(
+            db, request, response, plant_id, "how_to_plant", how_to_plant
+        )
+
+    existing_guide = await get_plant_guide(db, plant_id=plant_id)
+    if not existing_guide:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Plant guide not found for plant ID: {plant_id}. Use POST to create a new guide.",
+        )
+
+    check_if_match(request, model_versions(existing_guide))
+
     guide_update = PlantGuideUpdate(how_to_plant=how_to_plant)
-    updated_guide = update_plant_guide(
-        db=db, plant_id=plant_id, plant_guide=guide_update
-    )
+    try:
+        updated_guide = await update_plant_guide(
+            db=db, plant_id=plant_id, plant_guide=guide_update
+        )
+    except StaleDataError:
+        # Another request updated the guide after we read it
+        await db.rollback()
+        raise precondition_failed()
+
+    set_validators(response, model_versions(updated_guide))
     return updated_guide
 
 
 # UPDATE CARE GUIDE SECTION
 @router.patch("/{plant_id}/care-guide", response_model=PlantGuideResponse)
 async def update_care_guide_section(
-    plant_id: str, care_guide: Dict, db: Session = Depends(get_db)
+    plant_id: str,
+    care_guide: Dict,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
 ):
-    existing_guide = get_plant_guide(db, plant_id=plant_id)
-    if not existing_guide:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Plant guide not fqound for plant ID: {plant_id}. Use POST to create a new guide.",
-        )
-
+    """
+    Replace the section, or send application/merge-patch+json to change
+    only the keys in the body (null removes a key)
+    """
     # Validate JSON structure
     if not isinstance(care_guide, dict):
         raise HTTPException(
@@ -206,22 +340,51 @@ async def update_care_guide_section(
             detail="care_guide must be a JSON object",
         )
 
+    if is_merge_patch(request):
+        return await merge_patch_section(
+            db, request, response, plant_id, "care_guide", care_guide
+        )
+
+    existing_guide = await get_plant_guide(db, plant_id=plant_id)
+    if not existing_guide:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Plant guide not fqound for plant ID: {plant_id}. Use POST to create a new guide.",
+        )
+
+    check_if_match(request, model_versions(existing_guide))
+
     guide_update = PlantGuideUpdate(care_guide=care_guide)
-    updated_guide = update_plant_guide(
-        db=db, plant_id=plant_id, plant_guide=guide_update
-    )
+    try:
+        updated_guide = await update_plant_guide(
+            db=db, plant_id=plant_id, plant_guide=guide_update
+        )
+    except StaleDataError:
+        # Another request updated the guide after we read it
+        await db.rollback()
+        raise precondition_failed()
+
+    set_validators(response, model_versions(updated_guide))
     return updated_guide
 
 
 # DELETE PLANT GUIDE BY PLANT ID
 @router.delete("/{plant_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_guides(plant_id: str, db: Session = Depends(get_db)):
-    existing_guide = get_plant_guide(db, plant_id=plant_id)
+async def delete_guides(
+    plant_id: str, request: Request, db: AsyncSession = Depends(get_async_db)
+):
+    existing_guide = await get_plant_guide(db, plant_id=plant_id)
     if not existing_guide:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Plant guide not found for plant ID: {plant_id}",
         )
 
-    delete_plant_guide(db=db, plant_id=plant_id)
+    check_if_match(request, model_versions(existing_guide))
+
+    try:
+        await delete_plant_guide(db=db, plant_id=plant_id)
+    except StaleDataError:
+        await db.rollback()
+        raise precondition_failed()
     return None
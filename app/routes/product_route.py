@@ -1,67 +1,181 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Tuple
 from app.models.plant_model import Plant
-from app.schemas.plantguide_schema import PlantGuideCreate
-from database import get_db
+from database import AsyncSessionLocal, get_async_db
+from app.pagination import decode_cursor, set_next_cursor
+from app.serialization import fast_json
+from app.query_budget import query_budget
+from app.http_cache import (
+    check_if_match,
+    is_conditional,
+    model_versions,
+    not_modified,
+    not_modified_response,
+    precondition_failed,
+    row_versions,
+    set_validators,
+)
+from app.catalog_io import (
+    CATALOG_FORMATS,
+    CATALOG_MEDIA_TYPES,
+    DEFAULT_EXPORT_BATCH_SIZE,
+    DEFAULT_IMPORT_CHUNK_SIZE,
+    aiter_lines,
+    export_catalog,
+    import_catalog,
+)
 from app.schemas.product_schema import (
-    AccessoryCreate,
     AccessoryResponse,
-    PlantCreate,
+    PlantBrowseResult,
     PlantResponse,
     ProductResponse,
+    ProductDetailResponse,
+    ProductSearchResult,
     ProductUpdate,
+    CatalogImportReport,
     CompletePlantProductCreate,
     CompleteAccessoryProductCreate,
 )
 from app.crud.product_crud import (
-    create_product,
-    get_all_products,
+    MAX_PRODUCT_ROWS,
+    PRODUCT_EXPANSIONS,
+    create_accessory_product,
+    create_plant_product,
     get_product,
+    get_product_with_details,
     get_product_by_name,
-    get_products_by_type,
-    get_products_in_stock,
     update_product,
     delete_product,
 )
-from app.crud.plant_crud import (
-    create_plant,
-    delete_plant,
-    get_all_plants,
-    get_plant,
+from app.crud.plant_crud import delete_plant
+from app.crud.accesory_crud import delete_accessory
+from app.crud.catalog_cache_crud import (
+    get_cached_accessory,
+    get_cached_accessory_versions,
+    get_cached_plant,
+    get_cached_plant_browse,
+    get_cached_plant_versions,
+    get_cached_plants,
+    get_cached_product,
+    get_cached_product_versions,
+    get_cached_products,
+    get_cached_search,
 )
-from app.crud.accesory_crud import create_accessory, delete_accessory, get_accessory
-
 
 router = APIRouter(prefix="/products", tags=["Products"])
 
+EXPAND_DESCRIPTION = "Comma-separated relationships to embed: " + ",".join(
+    PRODUCT_EXPANSIONS
+)
+
+
+def parse_expand(expand: Optional[str]) -> Tuple[str, ...]:
+    if not expand:
+        return ()
+
+    requested = tuple(part.strip() for part in expand.split(",") if part.strip())
+    unknown = [part for part in requested if part not in PRODUCT_EXPANSIONS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown expand value(s): {', '.join(unknown)}",
+        )
+
+    return requested
+
 
 # GET ALL PLANTS
 @router.get("/plants", response_model=List[PlantResponse])
+@query_budget(1)
 async def get_plants(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(
+        None, description="X-Next-Cursor of the previous page"
+    ),
+    db: AsyncSession = Depends(get_async_db),
+):
+    after = decode_cursor(cursor)
+    plants = await get_cached_plants(
+        db, skip=skip, limit=limit, after=after[0] if after else None
+    )
+    set_next_cursor(response, plants, limit, "id")
+
+    versions = row_versions(plants)
+    if not_modified(request, versions):
+        return not_modified_response(versions)
+
+    set_validators(response, versions)
+    return fast_json(response, List[PlantResponse], plants)
+
+
+# BROWSE PLANTS WITH FACET COUNTS
+@router.get("/plants/browse", response_model=PlantBrowseResult)
+@query_budget(2)
+async def browse_plant_products(
+    response: Response,
+    category: Optional[str] = Query(None),
+    water: Optional[str] = Query(None),
+    light: Optional[str] = Query(None),
+    size: Optional[str] = Query(None),
+    soil_type: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=MAX_PRODUCT_ROWS),
+    cursor: Optional[str] = Query(
+        None, description="X-Next-Cursor of the previous page"
+    ),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    plants = get_all_plants(db, skip=skip, limit=limit)
-    return plants
+    """
+    Plant products matching every given attribute, plus per-value counts for
+    each attribute so the filter sidebar needs no extra requests
+    """
+    after = decode_cursor(cursor)
+    result = await get_cached_plant_browse(
+        db,
+        {
+            "category": category,
+            "water": water,
+            "light": light,
+            "size": size,
+            "soil_type": soil_type,
+        },
+        limit=limit,
+        after=after[0] if after else None,
+    )
+    set_next_cursor(response, result["items"], limit, "id")
+    return fast_json(response, PlantBrowseResult, result)
 
 
 # GET PLANT BY ID
 @router.get("/plants/{plant_id}", response_model=PlantResponse)
+@query_budget(2)
 async def get_plants(
     plant_id: str,
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    plant = get_plant(db, plant_id=plant_id)
+    if is_conditional(request):
+        versions = await get_cached_plant_versions(db, plant_id=plant_id)
+        if versions and not_modified(request, versions):
+            return not_modified_response(versions)
+
+    plant = await get_cached_plant(db, plant_id=plant_id)
 
     if not plant:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="plant not found"
         )
 
+    set_validators(response, row_versions(plant))
     return plant
 
 
@@ -70,9 +184,11 @@ async def get_plants(
     "/plant", response_model=ProductResponse, status_code=status.HTTP_201_CREATED
 )
 async def create_complete_plant_product(
-    plant_product: CompletePlantProductCreate, db: Session = Depends(get_db)
+    plant_product: CompletePlantProductCreate, db: AsyncSession = Depends(get_async_db)
 ):
-    existing_product = get_product_by_name(db, product_name=plant_product.product.name)
+    existing_product = await get_product_by_name(
+        db, product_name=plant_product.product.name
+    )
     if existing_product:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -87,30 +203,18 @@ async def create_complete_plant_product(
         )
 
     try:
-        db_product = create_product(db=db, product=plant_product.product)
-
-        # Create plant with the product's ID
-        plant_data = plant_product.plant.dict()
-        plant_data["id"] = db_product.id
-
-        plant_create = PlantCreate(**plant_data)
-        create_plant(db=db, plant=plant_create)
-
-        if plant_product.plant_guide:
-            from app.crud.plantguide_crud import create_plant_guide
-
-            # Set the plant_guide ID if needed
-            plant_guide_data = plant_product.plant_guide.dict()
-            plant_guide_data["plant_id"] = db_product.id
-
-            plant_guide_create = PlantGuideCreate(**plant_guide_data)
-            create_plant_guide(db=db, plant_guide=plant_guide_create)
-
-        db.refresh(db_product)
+        db_product = await create_plant_product(db=db, plant_product=plant_product)
         return db_product.to_dict()
 
+    except IntegrityError:
+        # Lost a race with a concurrent create of the same name
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Product name already exists",
+        )
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error creating plant product: {str(e)}",
@@ -122,9 +226,10 @@ async def create_complete_plant_product(
     "/accessory", response_model=ProductResponse, status_code=status.HTTP_201_CREATED
 )
 async def create_complete_accessory_product(
-    accessory_product: CompleteAccessoryProductCreate, db: Session = Depends(get_db)
+    accessory_product: CompleteAccessoryProductCreate,
+    db: AsyncSession = Depends(get_async_db),
 ):
-    existing_product = get_product_by_name(
+    existing_product = await get_product_by_name(
         db, product_name=accessory_product.product.name
     )
     if existing_product:
@@ -141,119 +246,291 @@ async def create_complete_accessory_product(
         )
 
     try:
-        db_product = create_product(db=db, product=accessory_product.product)
-
-        # Create accessory with the product's ID
-        accessory_data = accessory_product.accessory.dict()
-        accessory_data["id"] = db_product.id
-
-        accessory_create = AccessoryCreate(**accessory_data)
-        create_accessory(db=db, accessory=accessory_create)
-
-        db.refresh(db_product)
+        db_product = await create_accessory_product(
+            db=db, accessory_product=accessory_product
+        )
         return db_product.to_dict()
 
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Product name already exists",
+        )
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error creating accessory product: {str(e)}",
         )
 
 
+# BULK IMPORT PRODUCTS
+@router.post(
+    "/import",
+    response_model=CatalogImportReport,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/x-ndjson": {"schema": {"type": "string"}},
+                "text/csv": {"schema": {"type": "string"}},
+            },
+        }
+    },
+)
+async def import_products(
+    request: Request,
+    format: Optional[str] = Query(
+        None,
+        pattern=f"^({'|'.join(CATALOG_FORMATS)})$",
+        description="Defaults to csv for text/csv bodies, otherwise ndjson",
+    ),
+    chunk_size: int = Query(DEFAULT_IMPORT_CHUNK_SIZE, ge=1, le=5000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Stream NDJSON (one complete plant/accessory product per line) or CSV
+    records; rows are validated and inserted in batches and failures are
+    reported per line
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "csv" if "csv" in content_type else "ndjson"
+
+    return await import_catalog(
+        db, aiter_lines(request.stream()), fmt=format, chunk_size=chunk_size
+    )
+
+
+# EXPORT CATALOG
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "content": {media_type: {} for media_type in CATALOG_MEDIA_TYPES.values()}
+        }
+    },
+)
+async def export_products(
+    format: str = Query("ndjson", pattern=f"^({'|'.join(CATALOG_FORMATS)})$"),
+    batch_size: int = Query(DEFAULT_EXPORT_BATCH_SIZE, ge=1, le=10000),
+):
+    """
+    Stream every product with its plant, guide and accessory data in the
+    format accepted by /products/import
+    """
+
+    async def body():
+        # The streamed body outlives the request scope, so it owns its session
+        async with AsyncSessionLocal() as db:
+            async for chunk in export_catalog(db, fmt=format, batch_size=batch_size):
+                yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type=CATALOG_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="catalog.{format}"'},
+    )
+
+
 # GET ACCESSORY BY ID
 @router.get("/accessory/{accessory_id}", response_model=AccessoryResponse)
+@query_budget(2)
 async def get_plants(
     accessory_id: str,
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    accessory = get_accessory(db, accessory_id=accessory_id)
+    if is_conditional(request):
+        versions = await get_cached_accessory_versions(db, accessory_id=accessory_id)
+        if versions and not_modified(request, versions):
+            return not_modified_response(versions)
+
+    accessory = await get_cached_accessory(db, accessory_id=accessory_id)
 
     if not accessory:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="accessory not found"
         )
 
+    set_validators(response, row_versions(accessory))
     return accessory
 
 
+# SEARCH PRODUCTS
+@router.get("/search", response_model=List[ProductSearchResult])
+@query_budget(4)
+async def search_catalog(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=MAX_PRODUCT_ROWS),
+    cursor: Optional[str] = Query(
+        None, description="X-Next-Cursor of the previous page"
+    ),
+    expand: Optional[str] = Query(None, description=EXPAND_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Full-text search over names, descriptions, plant and accessory attributes
+    and guide text, most relevant first
+    """
+    results = await get_cached_search(
+        db,
+        q,
+        limit=limit,
+        after=decode_cursor(cursor, size=2),
+        expand=parse_expand(expand),
+    )
+    set_next_cursor(response, results, limit, "score", "id")
+    return fast_json(response, List[ProductSearchResult], results)
 
 
 # GET ALL PRODUCTS
-@router.get("/", response_model=List[ProductResponse])
+@router.get("/", response_model=List[ProductDetailResponse])
+@query_budget(4)
 async def get_products(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1, le=100),
-    product_type: Optional[str] = Query(None, regex="^(plant|accessory)$"),
+    limit: int = Query(100, ge=1, le=MAX_PRODUCT_ROWS),
+    product_type: Optional[str] = Query(None, pattern="^(plant|accessory)$"),
     in_stock: bool = Query(False),
-    db: Session = Depends(get_db),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    name: Optional[str] = Query(None, max_length=255, description="Name prefix"),
+    cursor: Optional[str] = Query(
+        None, description="X-Next-Cursor of the previous page"
+    ),
+    expand: Optional[str] = Query(None, description=EXPAND_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    if in_stock:
-        products = get_products_in_stock(db)
-    elif product_type:
-        products = get_products_by_type(db, product_type=product_type)
-    else:
-        products = get_all_products(db, skip=skip, limit=limit)
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="min_price must not be greater than max_price",
+        )
+
+    after = decode_cursor(cursor)
+    products = await get_cached_products(
+        db,
+        skip=skip,
+        limit=limit,
+        after=after[0] if after else None,
+        product_type=product_type,
+        in_stock=in_stock,
+        min_price=min_price,
+        max_price=max_price,
+        name_prefix=name,
+        expand=parse_expand(expand),
+    )
+    set_next_cursor(response, products, limit, "id")
+
+    versions = row_versions(products)
+    if not_modified(request, versions):
+        return not_modified_response(versions)
 
-    return products
+    set_validators(response, versions)
+    return fast_json(response, List[ProductDetailResponse], products)
 
 
 # GET PRODUCT BY ID
-@router.get("/{product_id}", response_model=ProductResponse)
-async def get_product_by_id(product_id: str, db: Session = Depends(get_db)):
-    product = get_product(db, product_id=product_id)
+@router.get("/{product_id}", response_model=ProductDetailResponse)
+@query_budget(4)
+async def get_product_by_id(
+    product_id: str,
+    request: Request,
+    response: Response,
+    expand: Optional[str] = Query(None, description=EXPAND_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db),
+):
+    expand = parse_expand(expand)
+
+    # Revalidation only needs the version columns, not the payload
+    if is_conditional(request):
+        versions = await get_cached_product_versions(
+            db, product_id=product_id, expand=expand
+        )
+        if versions and not_modified(request, versions):
+            return not_modified_response(versions)
+
+    product = await get_cached_product(db, product_id=product_id, expand=expand)
 
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Product not found"
         )
 
+    set_validators(response, row_versions(product))
     return product
 
 
 # UPDATE PRODUCT BY ID
 @router.put("/{product_id}", response_model=ProductResponse)
 async def update_product_by_id(
-    product_id: str, product_update: ProductUpdate, db: Session = Depends(get_db)
+    product_id: str,
+    product_update: ProductUpdate,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
 ):
-    existing_product = get_product(db, product_id=product_id)
+    existing_product = await get_product(db, product_id=product_id)
     if not existing_product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Product not found"
         )
 
-    updated_product = update_product(
-        db=db, product_id=product_id, product=product_update
-    )
+    check_if_match(request, model_versions(existing_product))
+
+    try:
+        updated_product = await update_product(
+            db=db, product_id=product_id, product=product_update
+        )
+    except StaleDataError:
+        # Another request updated the row after we read it
+        await db.rollback()
+        raise precondition_failed()
 
+    set_validators(response, model_versions(updated_product))
     return updated_product
 
 
 # DELETE PRODUCT BY ID
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_product_by_id(product_id: str, db: Session = Depends(get_db)):
+async def delete_product_by_id(
+    product_id: str, request: Request, db: AsyncSession = Depends(get_async_db)
+):
 
-    existing_product = get_product(db, product_id=product_id)
+    existing_product = await get_product_with_details(db, product_id=product_id)
     if not existing_product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Product not found"
         )
 
+    check_if_match(request, model_versions(existing_product))
+
     try:
         # Delete related entities first
         if existing_product.type == "plant" and existing_product.plant:
-            delete_plant(db=db, plant_id=product_id)
+            await delete_plant(db=db, plant_id=product_id)
         elif existing_product.type == "accessory" and existing_product.accessory:
-            delete_accessory(db=db, accessory_id=product_id)
+            await delete_accessory(db=db, accessory_id=product_id)
 
-        delete_product(db=db, product_id=product_id)
+        # The session outlives the commits, so drop the now-deleted children
+        db.expire(existing_product, ["plant", "accessory"])
+        await delete_product(db=db, product_id=product_id)
 
         return None
 
+    except StaleDataError:
+        await db.rollback()
+        raise precondition_failed()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error deleting product: {str(e)}",
@@ -0,0 +1,65 @@
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+from app.schemas.product_schema import ShortStockItem
+
+
+class OrderItemCreate(BaseModel):
+    product_id: str
+    quantity: int = Field(..., gt=0)
+
+
+class OrderCreate(BaseModel):
+    transac_id: str
+    items: List[OrderItemCreate] = Field(..., min_length=1)
+
+
+class OrderUpdate(BaseModel):
+    transac_id: Optional[str] = None
+
+
+class OrderItemResponse(BaseModel):
+    product_id: str
+    quantity: int
+    unit_price: float
+
+    class Config:
+        from_attributes = True
+
+
+class OrderResponse(BaseModel):
+    id: str
+    user_id: int
+    total_price: float
+    transac_id: str
+    created_at: datetime
+    items: List[OrderItemResponse] = []
+
+    class Config:
+        from_attributes = True
+
+
+class CheckoutConflict(BaseModel):
+    detail: str
+    short: List[ShortStockItem]
+
+
+# Spending aggregates
+class OrderSummary(BaseModel):
+    order_count: int
+    total_spent: float
+    last_order_at: Optional[datetime] = None
+
+
+class MonthlySpend(BaseModel):
+    year: int
+    month: int
+    order_count: int
+    total_spent: float
+
+
+class ProductTypeSpend(BaseModel):
+    type: str
+    quantity: int
+    total_spent: float
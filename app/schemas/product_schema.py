@@ -79,6 +79,26 @@ class ProductResponse(ProductBase):
     id: str
 
 
+# Products with relationships requested through ``expand``
+class PlantDetailResponse(PlantResponse):
+    plant_guide: Optional[PlantGuideResponse] = None
+
+
+class ProductDetailResponse(ProductResponse):
+    plant: Optional[PlantDetailResponse] = None
+    accessory: Optional[AccessoryResponse] = None
+
+
+class ProductSearchResult(ProductDetailResponse):
+    score: float
+
+
+class PlantBrowseResult(BaseModel):
+    items: List[ProductDetailResponse]
+    # facet -> value -> number of plants matching the other filters
+    facets: Dict[str, Dict[str, int]]
+
+
 # For creating complete product with details
 class CompletePlantProductCreate(BaseModel):
     product: ProductCreate
@@ -89,3 +109,23 @@ class CompletePlantProductCreate(BaseModel):
 class CompleteAccessoryProductCreate(BaseModel):
     product: ProductCreate
     accessory: AccessoryCreate
+
+
+# Bulk catalog import
+class ImportRowError(BaseModel):
+    line: int
+    name: Optional[str] = None
+    error: str
+
+
+class CatalogImportReport(BaseModel):
+    inserted: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
+
+
+# Items a checkout couldn't reserve
+class ShortStockItem(BaseModel):
+    product_id: str
+    requested: int
+    available: Optional[int] = None  # None when the product doesn't exist
@@ -0,0 +1,122 @@
+import re
+from typing import Any, Iterable, Iterator, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.order_model import Product
+from app.models.plant_model import Plant, PlantGuide
+from app.models.accesories_model import Accessory
+
+# Words shorter than this are dropped from queries (MySQL ignores them too)
+MIN_TERM_LENGTH = 2
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _document_strings(document: Any) -> Iterator[str]:
+    """Yield the keys and string values of a guide's JSON document"""
+    if isinstance(document, dict):
+        for key, value in document.items():
+            yield str(key).replace("_", " ")
+            yield from _document_strings(value)
+    elif isinstance(document, list):
+        for value in document:
+            yield from _document_strings(value)
+    elif isinstance(document, str):
+        yield document
+
+
+def build_search_text(
+    values: Iterable[Optional[str]], documents: Iterable[Any] = ()
+) -> str:
+    parts = [value for value in values if value]
+    for document in documents:
+        parts.extend(_document_strings(document))
+    return " ".join(parts)
+
+
+def product_search_text(
+    product,
+    plant=None,
+    plant_guide=None,
+    accessory=None,
+) -> str:
+    """search_text for a product from objects already in memory"""
+    values = [product.name, product.description]
+    documents = []
+    if plant is not None:
+        values += [plant.category, plant.water, plant.light]
+        values += [plant.soil_type, plant.size]
+    if plant_guide is not None:
+        documents += [plant_guide.how_to_plant, plant_guide.care_guide]
+    if accessory is not None:
+        values += [accessory.size, accessory.color]
+    return build_search_text(values, documents)
+
+
+def search_text_query():
+    """Columns feeding search_text, with the product's children outer-joined"""
+    return (
+        select(
+            Product.id,
+            Product.name,
+            Product.description,
+            Plant.category,
+            Plant.water,
+            Plant.light,
+            Plant.soil_type,
+            Plant.size,
+            PlantGuide.how_to_plant,
+            PlantGuide.care_guide,
+            Accessory.size.label("accessory_size"),
+            Accessory.color,
+        )
+        .outerjoin(Plant, Plant.id == Product.id)
+        .outerjoin(PlantGuide, PlantGuide.id == Plant.id)
+        .outerjoin(Accessory, Accessory.id == Product.id)
+    )
+
+
+def row_search_text(row) -> str:
+    return build_search_text(
+        [
+            row.name,
+            row.description,
+            row.category,
+            row.water,
+            row.light,
+            row.soil_type,
+            row.size,
+            row.accessory_size,
+            row.color,
+        ],
+        [row.how_to_plant, row.care_guide],
+    )
+
+
+async def refresh_search_text(db: AsyncSession, product_id: str):
+    """Recompute a product's search_text inside the caller's transaction
+
+    Called by every write that changes a product or one of its children; the
+    database's full-text index follows the column.
+    """
+    await db.flush()
+    result = await db.execute(search_text_query().filter(Product.id == product_id))
+    row = result.first()
+    if row is None:
+        return
+
+    # A Core UPDATE, so the product's row version (and ETag) is left alone
+    await db.execute(
+        update(Product)
+        .where(Product.id == product_id)
+        .values(search_text=row_search_text(row))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def search_terms(query: str) -> List[str]:
+    return [
+        term for term in _TERM_RE.findall(query.lower()) if len(term) >= MIN_TERM_LENGTH
+    ]
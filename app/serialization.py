@@ -0,0 +1,111 @@
+import os
+import typing
+from functools import lru_cache
+from typing import Any, Callable
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; FastAPI's own encoding is the fallback
+    orjson = None
+
+# Encode list payloads straight from cached dicts instead of re-validating them
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "true").lower() == "true"
+
+# Headers the endpoint's injected Response must not pass on to the real one
+_DROPPED_HEADERS = (b"content-length", b"content-type")
+
+Shaper = Callable[[Any], Any]
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _to_float(value: Any) -> Any:
+    # response_model would have coerced ints (e.g. an integral price) to float
+    if isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+@lru_cache(maxsize=None)
+def shaper(annotation: Any) -> Shaper:
+    """Build a function that trims a trusted payload to a response model's shape
+
+    The payload is not validated: keys the model doesn't declare are dropped,
+    missing ones get the field default, and nothing else is checked.
+    """
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        fields = [
+            (
+                name,
+                shaper(field.annotation),
+                None if field.is_required() else field.get_default(),
+            )
+            for name, field in annotation.model_fields.items()
+        ]
+
+        def shape_model(value):
+            if value is None:
+                return None
+            return {
+                name: shape(value.get(name, default)) for name, shape, default in fields
+            }
+
+        return shape_model
+
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin in (list, typing.List):
+        shape_item = shaper(args[0]) if args else _identity
+        if shape_item is _identity:
+            return _identity
+
+        def shape_list(value):
+            if value is None:
+                return None
+            return [shape_item(item) for item in value]
+
+        return shape_list
+
+    if origin is typing.Union:
+        members = [arg for arg in args if arg is not type(None)]
+        if len(members) == 1:
+            shape_member = shaper(members[0])
+            if shape_member is _identity:
+                return _identity
+            return lambda value: None if value is None else shape_member(value)
+        return _identity
+
+    if annotation is float:
+        return _to_float
+    return _identity
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+def fast_json(response: Response, annotation: Any, payload: Any) -> Any:
+    """Encode a trusted payload for ``annotation`` (the route's response_model)
+
+    Returns the payload unchanged when the fast path is off, so FastAPI
+    validates and encodes it as usual. The response_model still documents the
+    route in OpenAPI either way.
+    """
+    if not FAST_JSON_RESPONSES or orjson is None:
+        return payload
+
+    fast = FastJSONResponse(
+        shaper(annotation)(payload), status_code=response.status_code or 200
+    )
+    for key, value in response.raw_headers:
+        if key not in _DROPPED_HEADERS:
+            fast.raw_headers.append((key, value))
+    return fast
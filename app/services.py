@@ -1,26 +1,118 @@
+import asyncio
 import hashlib
-from passlib.context import CryptContext
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from datetime import datetime, timedelta
-from jose import jwt
-from typing import Optional
+from typing import Optional, Tuple
+
+from app.metrics import Histogram
 
 SECRET_KEY = "your-secret-key-here-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing settings
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "64"))
+
+
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    """Password hashing context, built on first use to keep passlib off startup
+
+    Pinning min/max to the configured cost makes hashes made with any other
+    cost factor report as needing an update.
+    """
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=BCRYPT_ROUNDS,
+        bcrypt__min_rounds=BCRYPT_ROUNDS,
+        bcrypt__max_rounds=BCRYPT_ROUNDS,
+    )
+
+
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop
+_hash_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+_hash_in_flight = 0
+_hash_rejected = 0
+hash_time_seconds = Histogram(buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the password hashing queue is full"""
+
+
+def _prehash(password: str) -> str:
+    return hashlib.sha256(password.encode("utf-8")).hexdigest()
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    sha256_digest = hashlib.sha256(plain_password.encode("utf-8")).hexdigest()
-    return pwd_context.verify(sha256_digest, hashed_password)
+    return get_pwd_context().verify(_prehash(plain_password), hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    print(password)
-    sha256_digest = hashlib.sha256(password.encode("utf-8")).hexdigest()
-    return pwd_context.hash(sha256_digest)
+    return get_pwd_context().hash(_prehash(password))
+
+
+def _verify_and_update(plain_password: str, hashed_password: str):
+    return get_pwd_context().verify_and_update(
+        _prehash(plain_password), hashed_password
+    )
+
+
+def _timed(func, *args):
+    start_time = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        hash_time_seconds.observe(time.perf_counter() - start_time)
+
+
+async def _run_in_hash_pool(func, *args):
+    global _hash_in_flight, _hash_rejected
+
+    # Shed load instead of letting a login burst queue up unbounded
+    if _hash_in_flight >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_LIMIT:
+        _hash_rejected += 1
+        raise PasswordHashingBusy("Password hashing queue is full")
+
+    _hash_in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, _timed, func, *args)
+    finally:
+        _hash_in_flight -= 1
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_in_hash_pool(get_password_hash, password)
+
+
+async def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """Verify off the event loop; returns a new hash if the cost factor changed"""
+    return await _run_in_hash_pool(_verify_and_update, plain_password, hashed_password)
+
+
+def password_hashing_metrics() -> dict:
+    return {
+        "workers": PASSWORD_HASH_WORKERS,
+        "queue_limit": PASSWORD_HASH_QUEUE_LIMIT,
+        "bcrypt_rounds": BCRYPT_ROUNDS,
+        "in_flight": _hash_in_flight,
+        "queue_depth": max(0, _hash_in_flight - PASSWORD_HASH_WORKERS),
+        "rejected_total": _hash_rejected,
+        "hash_time_seconds": hash_time_seconds.snapshot(),
+    }
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -32,6 +124,18 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
 
     to_encode.update({"exp": expire})
+    from jose import jwt  # deferred: python-jose pulls in the crypto backends
+
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
     return encoded_jwt
+
+
+def decode_access_token(token: str) -> dict:
+    """Decode and verify a token; raises ValueError if it's invalid or expired"""
+    from jose import JWTError, jwt
+
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError as e:
+        raise ValueError(str(e)) from e
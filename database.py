@@ -1,29 +1,154 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+import ast
+import asyncio
 import os
+import re
+import ssl
 from dotenv import load_dotenv
 
+from app.pool_metrics import InstrumentedAsyncQueuePool, instrument_engine
+
 load_dotenv()
 
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+
+# What each worker does about the schema at startup: "check" refuses to start
+# unless the database is at the Alembic head, "warn" only reports it,
+# "create" runs create_all (local development) and "off" skips it
+STARTUP_SCHEMA_MODES = ("check", "warn", "create", "off")
+STARTUP_SCHEMA_MODE = os.getenv("STARTUP_SCHEMA_MODE", "check").lower()
+# Pool connections each worker opens before serving its first request
+DB_POOL_PREWARM = int(os.getenv("DB_POOL_PREWARM", "1"))
+MIGRATIONS_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "alembic", "versions"
+)
+
+# Connection pool settings (per worker process)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+# "always" pings on every checkout, "idle" only pings connections that sat in
+# the pool longer than DB_POOL_PING_IDLE_SECONDS, "never" relies on recycle
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "idle").lower()
+DB_POOL_PING_IDLE_SECONDS = float(os.getenv("DB_POOL_PING_IDLE_SECONDS", "30"))
+SSL_CA_FILE = os.getenv("DATABASE_SSL_CA", "ca.pem")
 ssl_args = {
     "ssl": {
-        "ca": "ca.pem",
+        "ca": SSL_CA_FILE,
     }
 }
 
+# Async drivers used for each sync driver in DATABASE_URL
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_database_url(url: str) -> str:
+    """Derive the async driver URL from DATABASE_URL (ASYNC_DATABASE_URL wins)"""
+    override = os.getenv("ASYNC_DATABASE_URL")
+    if override:
+        return override
+
+    sa_url = make_url(url)
+    backend = sa_url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend: {backend}")
+
+    return sa_url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(
+        hide_password=False
+    )
+
+
+def get_connect_args(url: str, use_async: bool = False) -> dict:
+    # Only the MySQL drivers take the CA bundle; other backends use their defaults
+    if make_url(url).get_backend_name() != "mysql":
+        return {}
+    if use_async:
+        return {"ssl": ssl.create_default_context(cafile=SSL_CA_FILE)}
+    return ssl_args
+
+
+def get_pool_args() -> dict:
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING == "always",
+    }
+
+
+_engine = None
+_session_factory = None
+
+
+def get_engine():
+    """The sync engine, built on first use
+
+    Only scripts and create_tables() use it, so workers don't pay for the
+    sync driver import and a second pool at boot.
+    """
+    global _engine
+    if _engine is None:
+        _engine = create_engine(
+            DATABASE_URL,
+            connect_args=get_connect_args(DATABASE_URL),
+            **get_pool_args(),
+        )
+    return _engine
+
+
+def get_session_factory():
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = sessionmaker(
+            autocommit=False, autoflush=False, bind=get_engine()
+        )
+    return _session_factory
+
+
+def __getattr__(name):
+    # Keep `from database import engine, SessionLocal` working, lazily
+    if name == "engine":
+        return get_engine()
+    if name == "SessionLocal":
+        return get_session_factory()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args=ssl_args,
-    pool_timeout=30,
-    pool_recycle=3600,  # Recycle connections every hour
-    pool_pre_ping=True,  # Verify connections before use
+ASYNC_DATABASE_URL = get_async_database_url(DATABASE_URL)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    connect_args=get_connect_args(ASYNC_DATABASE_URL, use_async=True),
+    poolclass=InstrumentedAsyncQueuePool,
+    **get_pool_args(),
+)
+instrument_engine(
+    async_engine.sync_engine,
+    ping_idle_seconds=(
+        DB_POOL_PING_IDLE_SECONDS if DB_POOL_PRE_PING == "idle" else None
+    ),
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False so returned objects stay readable after commit
+# without an implicit (and, under asyncio, forbidden) lazy refresh
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
 
 Base = declarative_base()
 
@@ -32,7 +157,7 @@ def create_tables():
     print("Creating database tables...")
 
     try:
-        Base.metadata.create_all(bind=engine)
+        Base.metadata.create_all(bind=get_engine())
         print("Database tables created successfully!")
 
     except Exception as e:
@@ -40,9 +165,101 @@ def create_tables():
         raise
 
 
+_REVISION_RE = re.compile(r"^(revision|down_revision)\s*=\s*([^#\n]+)", re.MULTILINE)
+
+
+def alembic_heads(versions_dir: str = MIGRATIONS_DIR) -> set:
+    """Head revisions, read straight from the migration files
+
+    Asking alembic.script instead would import Alembic and every migration
+    in each worker, which costs more than the rest of startup combined.
+    """
+    revisions, parents = set(), set()
+    for filename in os.listdir(versions_dir):
+        if not filename.endswith(".py"):
+            continue
+        with open(os.path.join(versions_dir, filename), encoding="utf-8") as f:
+            values = dict(_REVISION_RE.findall(f.read()))
+        if "revision" not in values:
+            continue
+        revisions.add(ast.literal_eval(values["revision"].strip()))
+        down_revision = ast.literal_eval(values.get("down_revision", "None").strip())
+        if isinstance(down_revision, str):
+            parents.add(down_revision)
+        elif down_revision:
+            parents.update(down_revision)
+    return revisions - parents
+
+
+async def check_schema_version(conn) -> bool:
+    """Compare the database's alembic_version with the migration heads"""
+    try:
+        result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+        current = {row[0] for row in result}
+    except DBAPIError:
+        await conn.rollback()
+        current = set()
+
+    heads = alembic_heads()
+    if current == heads:
+        return True
+
+    message = (
+        f"Database schema is at {sorted(current) or 'no revision'}, "
+        f"expected Alembic head {sorted(heads)}; run `alembic upgrade head`"
+    )
+    if STARTUP_SCHEMA_MODE == "check":
+        raise RuntimeError(message)
+    print(f"⚠️ {message}")
+    return False
+
+
+async def prepare_database():
+    """Per-worker startup: verify the schema version and warm the pool
+
+    Migrations run once per deploy (`alembic upgrade head`), not per worker.
+    """
+    # A typo must not silently turn the schema check off
+    if STARTUP_SCHEMA_MODE not in STARTUP_SCHEMA_MODES:
+        raise ValueError(
+            f"STARTUP_SCHEMA_MODE must be one of {', '.join(STARTUP_SCHEMA_MODES)}, "
+            f"not {STARTUP_SCHEMA_MODE!r}"
+        )
+
+    if STARTUP_SCHEMA_MODE == "create":
+        create_tables()
+
+    count = DB_POOL_PREWARM
+    if STARTUP_SCHEMA_MODE in ("check", "warn"):
+        count = max(count, 1)
+    if count <= 0:
+        return
+
+    opened = await asyncio.gather(
+        *(async_engine.connect().start() for _ in range(count)),
+        return_exceptions=True,
+    )
+    connections = [conn for conn in opened if not isinstance(conn, BaseException)]
+    try:
+        for conn in opened:
+            if isinstance(conn, BaseException):
+                raise conn
+        if STARTUP_SCHEMA_MODE in ("check", "warn"):
+            await check_schema_version(connections[0])
+    finally:
+        # Closing returns them to the pool still connected
+        for conn in connections:
+            await conn.close()
+
+
 def get_db():
-    db = SessionLocal()
+    db = get_session_factory()()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -4,4 +4,11 @@ worker_class = "uvicorn.workers.UvicornWorker"
 timeout = 120
 loglevel = "info"
 accesslog = "-"
-errorlog = "-"
\ No newline at end of file
+errorlog = "-"
+
+
+def on_starting(server):
+    # Per-worker metric snapshots from a previous run would be summed in
+    from app.request_metrics import request_metrics
+
+    request_metrics.clear_directory()
@@ -1,13 +1,16 @@
-from fastapi import APIRouter, Depends, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from datetime import datetime
 from typing import Dict, Any
 import time
 
-from app.models.user_model import User
+from app.db_stats import estimated_snapshot, exact_snapshot
+from app.schemas.auth_schema import UserResponse
 from app.routes.auth_route import get_current_user
-from database import get_db, engine
+from app.services import password_hashing_metrics
+from app.pool_metrics import pool_metrics
+from database import async_engine, get_async_db
 
 router = APIRouter(prefix="/health", tags=["Health"])
 
@@ -26,7 +29,9 @@ async def basic_health_check():
 
 
 @router.get("/detailed")
-async def detailed_health_check(db: Session = Depends(get_db)) -> Dict[str, Any]:
+async def detailed_health_check(
+    db: AsyncSession = Depends(get_async_db),
+) -> Dict[str, Any]:
     """
     Detailed health check - verifies all critical services
 
@@ -48,7 +53,7 @@ async def detailed_health_check(db: Session = Depends(get_db)) -> Dict[str, Any]
     # 2. Database Connection Check
     try:
         start_time = time.time()
-        db.execute(text("SELECT 1"))
+        await db.execute(text("SELECT 1"))
         db_response_time = (time.time() - start_time) * 1000  # Convert to ms
 
         health_status["checks"]["database"] = {
@@ -67,7 +72,7 @@ async def detailed_health_check(db: Session = Depends(get_db)) -> Dict[str, Any]
     try:
         start_time = time.time()
         # Try to count users (will fail if table doesn't exist)
-        result = db.execute(text("SELECT COUNT(*) FROM users"))
+        result = await db.execute(text("SELECT COUNT(*) FROM users"))
         user_count = result.scalar()
         query_time = (time.time() - start_time) * 1000
 
@@ -104,50 +109,63 @@ async def liveness_check():
     return {"status": "alive", "timestamp": datetime.utcnow().isoformat()}
 
 
+@router.get("/password-hashing")
+async def password_hashing_status(
+    current_user: UserResponse = Depends(get_current_user),
+):
+    """
+    Password hashing pool - queue depth, rejections and hash time histogram
+    """
+    return {
+        "status": "success",
+        "timestamp": datetime.utcnow().isoformat(),
+        "metrics": password_hashing_metrics(),
+    }
+
+
+@router.get("/db-pool")
+async def database_pool_status(
+    current_user: UserResponse = Depends(get_current_user),
+):
+    """
+    Connection pool - connections in use, overflow, checkout wait and
+    connect latency histograms
+    """
+    return {
+        "status": "success",
+        "timestamp": datetime.utcnow().isoformat(),
+        "metrics": pool_metrics.snapshot(async_engine.pool),
+    }
+
+
 @router.get("/db-stats")
 async def database_statistics(
-    db: Session = Depends(get_db),
-    #   current_user: User = Depends(get_current_user),
+    exact: bool = Query(
+        False, description="Count rows exactly instead of using planner estimates"
+    ),
+    current_user: UserResponse = Depends(get_current_user),
 ):
     """
     Database statistics - useful for monitoring
+    Served from a snapshot refreshed every DB_STATS_TTL seconds, so polling
+    doesn't touch the database
     """
+    snapshot = exact_snapshot if exact else estimated_snapshot
     try:
-        stats = {}
-
-        # Count records in each table
-        tables = [
-            "users",
-            "products",
-            "plants",
-            "accessories",
-            "plant_guides",
-            "orders",
-        ]
-
-        for table in tables:
-            try:
-                result = db.execute(text(f"SELECT COUNT(*) FROM {table}"))
-                stats[table] = result.scalar()
-            except Exception as e:
-                stats[table] = f"Error: {str(e)}"
-
-        # Database size (PostgreSQL specific)
-        try:
-            result = db.execute(text("SELECT pg_database_size(current_database())"))
-            db_size_bytes = result.scalar()
-            stats["database_size_mb"] = round(db_size_bytes / (1024 * 1024), 2)
-        except:
-            stats["database_size_mb"] = "N/A"
-
-        return {
-            "status": "success",
-            "timestamp": datetime.utcnow().isoformat(),
-            "statistics": stats,
-        }
+        stats = await snapshot.get()
     except Exception as e:
         return {
             "status": "error",
             "message": str(e),
             "timestamp": datetime.utcnow().isoformat(),
         }
+
+    return {
+        "status": "success",
+        "timestamp": datetime.utcnow().isoformat(),
+        "estimated": not exact,
+        "as_of": snapshot.taken_at.isoformat(),
+        "age_seconds": snapshot.age_seconds(),
+        "refresh_error": snapshot.last_error,
+        "statistics": stats,
+    }
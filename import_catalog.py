@@ -0,0 +1,48 @@
+"""Bulk-load a catalog file into the database
+
+python import_catalog.py catalog.ndjson
+python import_catalog.py catalog.csv --chunk-size 1000
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+
+from app.catalog_io import CATALOG_FORMATS, DEFAULT_IMPORT_CHUNK_SIZE, import_catalog
+from database import AsyncSessionLocal, async_engine
+import app.models  # noqa: F401 - registers every mapper before the first query
+
+
+async def _file_lines(path: str):
+    with open(path, encoding="utf-8", newline="") as catalog_file:
+        for line in catalog_file:
+            yield line.rstrip("\r\n")
+
+
+async def main(path: str, fmt: str, chunk_size: int) -> int:
+    try:
+        async with AsyncSessionLocal() as db:
+            report = await import_catalog(
+                db, _file_lines(path), fmt=fmt, chunk_size=chunk_size
+            )
+    finally:
+        await async_engine.dispose()
+
+    print(json.dumps(report.dict(), indent=2))
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="NDJSON or CSV catalog file")
+    parser.add_argument(
+        "--format",
+        choices=CATALOG_FORMATS,
+        help="Defaults to the file extension (.csv), otherwise ndjson",
+    )
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    sys.exit(asyncio.run(main(args.path, fmt, args.chunk_size)))
@@ -1,8 +1,23 @@
 import os
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import auth_route, plantguide_route, product_route
-from database import create_tables, engine, Base
+from app.routes import auth_route, order_route, plantguide_route, product_route
+from app.routes.auth_route import get_current_user
+from app.schemas.auth_schema import UserResponse
+from app.compression import CompressionMiddleware
+from app.pagination import NEXT_CURSOR_HEADER
+from app.query_budget import (
+    QUERY_BUDGET_MODE,
+    QueryBudgetMiddleware,
+    instrument_query_budget,
+)
+from app.request_metrics import (
+    RequestMetricsMiddleware,
+    instrument_queries,
+    request_metrics,
+)
+from database import async_engine, prepare_database
 from app.models import *
 import health_check
 
@@ -15,18 +30,48 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+# gzip/brotli for large JSON bodies, negotiated from Accept-Encoding
+app.add_middleware(CompressionMiddleware)
+
+# Opt-in N+1 guard for CI and staging (QUERY_BUDGET_MODE=log|raise)
+if QUERY_BUDGET_MODE != "off":
+    app.add_middleware(QueryBudgetMiddleware)
+instrument_query_budget(async_engine.sync_engine)
+
+# Outermost, so latency and response size are measured as the client sees them
+app.add_middleware(RequestMetricsMiddleware)
+instrument_queries(async_engine.sync_engine)
+
 # Include routers
 app.include_router(health_check.router)
 app.include_router(auth_route.router)
 app.include_router(product_route.router)
 app.include_router(plantguide_route.router)
+app.include_router(order_route.router)
 
 
 @app.on_event("startup")
-def startup():
-    create_tables()
+async def startup():
+    await prepare_database()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await async_engine.dispose()
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(current_user: UserResponse = Depends(get_current_user)):
+    """
+    Prometheus exposition of per-route metrics, summed over all workers
+    """
+    return PlainTextResponse(
+        request_metrics.render_prometheus(),
+        media_type="text/plain; version=0.0.4",
+    )
 
 
 @app.get("/")
@@ -38,6 +83,9 @@ def root():
             "/health/detailed": "detailed health status",
             "/health/live": "Liveness check - for Kubernetes/container(if any)",
             "/health/db-stats": "Database statistics (Auth Required)",
+            "/health/password-hashing": "Password hashing pool metrics (Auth Required)",
+            "/health/db-pool": "Database connection pool metrics (Auth Required)",
+            "/metrics": "Per-route latency, DB query and response size metrics (Prometheus, Auth Required)",
         },
     }
 
@@ -0,0 +1,40 @@
+"""Mark a database built by create_tables() as the Alembic baseline
+
+python stamp_baseline.py
+
+Databases created before the migration chain existed have the baseline
+tables but no alembic_version table, so `alembic upgrade head` would fail
+trying to create them again. This stamps such a database at revision 0001,
+once: an empty or already versioned database is left alone, so deploys can
+run it before every `alembic upgrade head`.
+"""
+
+import os
+import sys
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+
+from database import get_engine
+
+BASELINE_REVISION = "0001"
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
+
+def main() -> int:
+    tables = set(inspect(get_engine()).get_table_names())
+    if "alembic_version" in tables:
+        print("Database is already versioned; nothing to stamp")
+        return 0
+    if "products" not in tables:
+        print("Database has no tables yet; `alembic upgrade head` will create them")
+        return 0
+
+    command.stamp(Config(ALEMBIC_INI), BASELINE_REVISION)
+    print(f"✅ Stamped the existing schema as Alembic revision {BASELINE_REVISION}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
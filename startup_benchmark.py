@@ -0,0 +1,90 @@
+"""Measure cold-start time to the first served request
+
+python startup_benchmark.py
+python startup_benchmark.py --runs 5 --path /health/detailed --max-seconds 3
+
+Starts the app with uvicorn in a fresh process for each run, polls until the
+first request succeeds and reports how long that took. With --max-seconds it
+exits non-zero when the median is slower, so CI can catch cold-start
+regressions.
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_request(path: str, timeout: float) -> float:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}{path}"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with code {server.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    response.read()
+                return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        raise RuntimeError(f"No response from {url} within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(runs: int, path: str, timeout: float, max_seconds: float) -> int:
+    timings = []
+    for run in range(1, runs + 1):
+        elapsed = time_to_first_request(path, timeout)
+        timings.append(elapsed)
+        print(f"run {run}: {elapsed * 1000:.0f} ms")
+
+    median = statistics.median(timings)
+    print(
+        f"time to first request: median {median * 1000:.0f} ms, "
+        f"min {min(timings) * 1000:.0f} ms, max {max(timings) * 1000:.0f} ms"
+    )
+    if max_seconds and median > max_seconds:
+        print(f"❌ Median is above the {max_seconds}s budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--path", default="/health/", help="First request to time")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument(
+        "--max-seconds", type=float, default=0, help="Fail above this median"
+    )
+    args = parser.parse_args()
+
+    sys.exit(main(args.runs, args.path, args.timeout, args.max_seconds))
@@ -0,0 +1,87 @@
+import os
+import tempfile
+
+import pytest
+
+# Settings are read at import time, so they have to be in place before any
+# app module is imported
+_TMP_DIR = tempfile.mkdtemp(prefix="leafify-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'test.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ["STARTUP_SCHEMA_MODE"] = "off"
+# Every request made by the tests must stay within its route's @query_budget
+os.environ["QUERY_BUDGET_MODE"] = "raise"
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["METRICS_DIR"] = os.path.join(_TMP_DIR, "metrics")
+os.environ["CATALOG_CACHE_GENERATION_FILE"] = os.path.join(_TMP_DIR, "catalog-gen")
+os.environ["CATALOG_CACHE_ROW_GENERATION_FILE"] = os.path.join(_TMP_DIR, "catalog-rows")
+os.environ["USER_CACHE_GENERATION_FILE"] = os.path.join(_TMP_DIR, "user-gen")
+
+import httpx  # noqa: E402
+
+from app.cache import catalog_cache  # noqa: E402
+from database import Base, get_engine  # noqa: E402
+from main import app  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    Base.metadata.create_all(bind=get_engine())
+
+
+@pytest.fixture(autouse=True)
+def empty_tables(schema):
+    # Deleting keeps the SQLite-only search index and its triggers in place;
+    # cached catalog payloads must not outlive the rows
+    with get_engine().begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    catalog_cache.invalidate()
+
+
+@pytest.fixture
+async def client():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        yield c
+
+
+async def signup_and_login(client, email="gardener@example.com"):
+    """Bearer headers for a newly registered user"""
+    response = await client.post(
+        "/auth/signup",
+        json={"name": "Gardener", "email": email, "password": "secret123"},
+    )
+    assert response.status_code == 201, response.text
+    response = await client.post(
+        "/auth/login", data={"username": email, "password": "secret123"}
+    )
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def create_plant(client, name="Monstera", stock=5, price=25.0, guide=False):
+    payload = {
+        "product": {"name": name, "price": price, "stock": stock, "type": "plant"},
+        "plant": {
+            "category": "indoor",
+            "water": "weekly",
+            "light": "bright indirect",
+            "soil_type": "loam",
+            "size": "medium",
+        },
+    }
+    if guide:
+        payload["plant_guide"] = {
+            "id": "",
+            "how_to_plant": {"depth": "10cm", "spacing": "30cm"},
+            "care_guide": {"water": "weekly", "feed": "monthly"},
+        }
+    response = await client.post("/products/plant", json=payload)
+    assert response.status_code in (200, 201), response.text
+    return response.json()
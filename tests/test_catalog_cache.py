@@ -0,0 +1,104 @@
+import pytest
+
+from app.cache import CatalogCache, SharedGeneration, TTLCache
+from conftest import create_plant
+
+pytestmark = pytest.mark.anyio
+
+
+def worker_cache(path):
+    """One worker's view of a catalog cache shared through ``path``"""
+    return CatalogCache(
+        TTLCache(maxsize=100, ttl=60),
+        SharedGeneration(path),
+        SharedGeneration(f"{path}.rows", slots=65),
+    )
+
+
+def test_bump_is_seen_by_every_mapping(tmp_path):
+    path = str(tmp_path / "generation")
+    first, second = SharedGeneration(path), SharedGeneration(path)
+    assert first.shared and second.shared
+
+    first.bump()
+    first.bump()
+    assert second.current() == first.current() == 2
+
+
+def test_slots_count_independently(tmp_path):
+    generations = SharedGeneration(str(tmp_path / "slots"), slots=8)
+    generations.bump(3)
+    assert generations.current(3) == 1
+    assert generations.current(4) == 0
+
+
+def test_unmappable_path_falls_back_to_a_local_counter(tmp_path):
+    generation = SharedGeneration(str(tmp_path / "missing" / "generation"))
+    assert not generation.shared
+    assert generation.bump() == 1
+
+
+async def test_invalidate_clears_other_workers(tmp_path):
+    path = str(tmp_path / "catalog")
+    writer, reader = worker_cache(path), worker_cache(path)
+
+    async def load():
+        return [{"id": "p1", "version": 1, "name": "Fern"}]
+
+    await reader.get_or_load(("products",), load)
+    assert reader.get(("products",)) is not None
+
+    writer.invalidate()
+    assert reader.get(("products",)) is None
+
+
+async def test_value_loaded_during_a_write_is_not_cached(tmp_path):
+    path = str(tmp_path / "catalog")
+    writer, reader = worker_cache(path), worker_cache(path)
+
+    async def load_racing_a_write():
+        value = {"id": "p1", "version": 1}
+        writer.invalidate()  # commits after this value was read
+        return value
+
+    assert await reader.get_or_load(("product", "p1"), load_racing_a_write)
+    assert reader.get(("product", "p1")) is None
+
+
+async def test_row_invalidation_spares_unrelated_entries(tmp_path):
+    path = str(tmp_path / "catalog")
+    writer, reader = worker_cache(path), worker_cache(path)
+
+    async def load_list():
+        return {"items": [{"id": "p1", "version": 1}, {"id": "p2", "version": 4}]}
+
+    async def load_other():
+        return {"id": "p3", "version": 1}
+
+    await reader.get_or_load(("browse",), load_list)
+    await reader.get_or_load(("product", "p3"), load_other)
+
+    writer.invalidate_rows(["p2"])
+    assert reader.get(("browse",)) is None
+    assert reader.get(("product", "p3")) is not None
+
+
+async def test_catalog_writes_reach_cached_reads(client):
+    plant = await create_plant(client, name="Fern", price=10.0)
+    assert (await client.get(f"/products/{plant['id']}")).json()["price"] == 10.0
+
+    response = await client.put(f"/products/{plant['id']}", json={"price": 12.0})
+    assert response.status_code == 200
+    assert (await client.get(f"/products/{plant['id']}")).json()["price"] == 12.0
+
+
+def test_byte_budget_evicts_least_recently_used():
+    cache = TTLCache(maxsize=10, ttl=60, max_bytes=100)
+    cache.set("a", "a", size=60)
+    cache.set("b", "b", size=30)
+    cache.get("a")
+    cache.set("c", "c", size=30)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "a" and cache.get("c") == "c"
+    assert cache.bytes == 90
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+import app.catalog_io as catalog_io
+from conftest import create_plant
+
+pytestmark = pytest.mark.anyio
+
+
+def plant_record(name, stock=3):
+    return {
+        "product": {"name": name, "price": 12.5, "stock": stock, "type": "plant"},
+        "plant": {
+            "category": "indoor",
+            "water": "weekly",
+            "light": "shade",
+            "soil_type": "peat",
+            "size": "small",
+        },
+    }
+
+
+def ndjson(*records):
+    return "\n".join(
+        record if isinstance(record, str) else json.dumps(record) for record in records
+    )
+
+
+async def import_body(client, body, **params):
+    return await client.post(
+        "/products/import",
+        content=body,
+        params=params,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+
+async def test_import_reports_bad_rows_by_line(client):
+    body = ndjson(
+        plant_record("Calathea"),
+        "{not json",
+        {"product": {"name": "No price", "type": "plant"}, "plant": {}},
+        plant_record("Pilea"),
+    )
+
+    report = (await import_body(client, body)).json()
+    assert report["inserted"] == 2
+    assert report["failed"] == 2
+    assert [error["line"] for error in report["errors"]] == [2, 3]
+    assert report["errors"][1]["name"] == "No price"
+
+
+async def test_duplicate_names_differing_in_case_are_rejected(client):
+    await create_plant(client, name="Monstera")
+    body = ndjson(plant_record("MONSTERA"), plant_record("Fern"), plant_record("fern"))
+
+    report = (await import_body(client, body)).json()
+    assert report["inserted"] == 1
+    assert [(e["line"], e["name"]) for e in report["errors"]] == [
+        (1, "MONSTERA"),
+        (3, "fern"),
+    ]
+
+
+async def test_conflict_in_a_batch_only_fails_the_conflicting_rows(client, monkeypatch):
+    await create_plant(client, name="Aloe")
+
+    # As if a concurrent import inserted "Aloe" after the duplicate check
+    async def nothing_exists(db, names):
+        return set()
+
+    monkeypatch.setattr(catalog_io, "get_existing_product_names", nothing_exists)
+    body = ndjson(plant_record("Cactus"), plant_record("Aloe"), plant_record("Agave"))
+
+    report = (await import_body(client, body, chunk_size=10)).json()
+    assert report["inserted"] == 2
+    assert [error["line"] for error in report["errors"]] == [2]
+
+    names = {p["name"] for p in (await client.get("/products/")).json()}
+    assert names == {"Aloe", "Cactus", "Agave"}
@@ -0,0 +1,136 @@
+import os
+
+import pytest
+
+from sqlalchemy import func, select, update
+
+from app.cache import CatalogCache, SharedGeneration, TTLCache
+from app.crud.order_crud import checkout_order
+from app.models.order_model import Order, Product
+from app.schemas.order_schema import OrderCreate
+from database import AsyncSessionLocal, async_engine
+from conftest import create_plant, signup_and_login
+
+pytestmark = pytest.mark.anyio
+
+
+def checkout(client, headers, *items):
+    return client.post(
+        "/orders/checkout",
+        json={
+            "transac_id": "txn-1",
+            "items": [
+                {"product_id": product_id, "quantity": quantity}
+                for product_id, quantity in items
+            ],
+        },
+        headers=headers,
+    )
+
+
+async def stock_of(client, product_id):
+    return (await client.get(f"/products/{product_id}")).json()["stock"]
+
+
+async def test_checkout_takes_stock(client):
+    headers = await signup_and_login(client)
+    plant = await create_plant(client, stock=5)
+
+    response = await checkout(client, headers, (plant["id"], 2))
+    assert response.status_code == 201, response.text
+    assert response.json()["total_price"] == 50.0
+    assert await stock_of(client, plant["id"]) == 3
+
+
+async def test_short_item_fails_the_whole_checkout(client):
+    headers = await signup_and_login(client)
+    plenty = await create_plant(client, name="Fern", stock=10)
+    scarce = await create_plant(client, name="Orchid", stock=1)
+
+    response = await checkout(client, headers, (plenty["id"], 2), (scarce["id"], 3))
+    assert response.status_code == 409
+    assert response.json()["short"] == [
+        {"product_id": scarce["id"], "requested": 3, "available": 1}
+    ]
+
+    # Nothing was taken, and no order was written
+    assert await stock_of(client, plenty["id"]) == 10
+    assert await stock_of(client, scarce["id"]) == 1
+    assert (await client.get("/orders/", headers=headers)).json() == []
+
+
+async def test_unknown_product_is_reported_short(client):
+    headers = await signup_and_login(client)
+
+    response = await checkout(client, headers, ("no-such-product", 1))
+    assert response.status_code == 409
+    assert response.json()["short"][0]["available"] is None
+
+
+async def test_checkout_only_drops_cached_entries_of_its_products(client):
+    headers = await signup_and_login(client)
+    bought = await create_plant(client, name="Fern", stock=5)
+    other = await create_plant(client, name="Orchid", stock=5)
+    assert await stock_of(client, bought["id"]) == 5
+
+    # Another worker with both products cached
+    worker = CatalogCache(
+        TTLCache(maxsize=100, ttl=60),
+        SharedGeneration(os.environ["CATALOG_CACHE_GENERATION_FILE"]),
+        SharedGeneration(os.environ["CATALOG_CACHE_ROW_GENERATION_FILE"], slots=4097),
+    )
+
+    async def load(product):
+        return {"id": product["id"], "version": 1, "stock": 5}
+
+    await worker.get_or_load(("product", bought["id"]), lambda: load(bought))
+    await worker.get_or_load(("product", other["id"]), lambda: load(other))
+
+    response = await checkout(client, headers, (bought["id"], 1))
+    assert response.status_code == 201
+    assert worker.get(("product", bought["id"])) is None
+    assert worker.get(("product", other["id"])) is not None
+    assert await stock_of(client, bought["id"]) == 4
+
+
+@pytest.mark.parametrize("returning", [True, False])
+async def test_restock_after_a_failed_reservation_still_fails_checkout(
+    client, monkeypatch, returning
+):
+    headers = await signup_and_login(client)
+    user_id = (await client.get("/auth/me", headers=headers)).json()["id"]
+    plenty = await create_plant(client, name="Fern", stock=10)
+    scarce = await create_plant(client, name="Orchid", stock=1)
+    # Without RETURNING only the rowcount says the UPDATE fell short
+    monkeypatch.setattr(async_engine.sync_engine.dialect, "update_returning", returning)
+
+    order = OrderCreate(
+        transac_id="txn-race",
+        items=[
+            {"product_id": plenty["id"], "quantity": 2},
+            {"product_id": scarce["id"], "quantity": 3},
+        ],
+    )
+
+    async with AsyncSessionLocal() as db:
+        rollback = db.rollback
+
+        async def rollback_then_restock():
+            await rollback()
+            # Another request restocks before the short items are read back
+            async with AsyncSessionLocal() as other:
+                await other.execute(update(Product).values(stock=100))
+                await other.commit()
+
+        db.rollback = rollback_then_restock
+        db_order, short = await checkout_order(db, user_id=user_id, order=order)
+
+    assert db_order is None
+    assert short
+    if returning:
+        assert [item["product_id"] for item in short] == [scarce["id"]]
+
+    async with AsyncSessionLocal() as db:
+        assert await db.scalar(select(func.count()).select_from(Order)) == 0
+        stock = dict((await db.execute(select(Product.id, Product.stock))).all())
+    assert stock == {plenty["id"]: 100, scarce["id"]: 100}
@@ -0,0 +1,80 @@
+import gzip
+import zlib
+
+import pytest
+
+from app.compression import _StreamCompressor
+from conftest import create_plant
+
+pytestmark = pytest.mark.anyio
+
+GZIP = {"Accept-Encoding": "gzip"}
+
+
+async def create_catalog(client, count=12):
+    for i in range(count):
+        await create_plant(client, name=f"Plant {i:02d}")
+
+
+async def test_encoded_response_has_its_own_etag(client):
+    await create_catalog(client)
+    identity = await client.get("/products/", headers={"Accept-Encoding": "identity"})
+    encoded = await client.get("/products/", headers=GZIP)
+
+    assert encoded.headers["content-encoding"] == "gzip"
+    assert encoded.headers["etag"] == identity.headers["etag"][:-1] + '-gzip"'
+    assert "Accept-Encoding" in encoded.headers["vary"]
+
+
+async def test_if_none_match_with_encoded_etag(client):
+    await create_catalog(client)
+    etag = (await client.get("/products/", headers=GZIP)).headers["etag"]
+
+    response = await client.get("/products/", headers={**GZIP, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+
+async def test_if_match_accepts_encoded_etag(client):
+    product_id = (await create_plant(client))["id"]
+    etag = (await client.get(f"/products/{product_id}")).headers["etag"]
+
+    response = await client.put(
+        f"/products/{product_id}",
+        json={"price": 30.0},
+        headers={"If-Match": etag[:-1] + '-gzip"'},
+    )
+    assert response.status_code == 200
+
+
+def test_stream_chunks_decode_before_the_stream_ends():
+    compressor = _StreamCompressor("gzip")
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    first = compressor.compress(b'{"id": 1}\n')
+    assert decoder.decompress(first) == b'{"id": 1}\n'
+
+    rest = compressor.compress(b'{"id": 2}\n') + compressor.finish()
+    assert gzip.decompress(first + rest) == b'{"id": 1}\n{"id": 2}\n'
+
+
+@pytest.mark.parametrize(
+    "accept_encoding", ["gzip", "identity", None], ids=["small", "identity", "none"]
+)
+async def test_uncompressed_responses_still_vary(client, accept_encoding):
+    product_id = (await create_plant(client))["id"]
+    headers = {"Accept-Encoding": accept_encoding} if accept_encoding else {}
+    if accept_encoding is None:
+        # httpx sends its own Accept-Encoding unless it is removed
+        client.headers.pop("Accept-Encoding", None)
+
+    response = await client.get(f"/products/{product_id}", headers=headers)
+    assert "content-encoding" not in response.headers
+    assert "Accept-Encoding" in response.headers["vary"]
+
+    etag = response.headers["etag"]
+    response = await client.get(
+        f"/products/{product_id}", headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert "Accept-Encoding" in response.headers["vary"]
@@ -0,0 +1,84 @@
+import pytest
+
+from conftest import create_plant
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_if_none_match_returns_304(client):
+    plant = await create_plant(client)
+    response = await client.get(f"/products/{plant['id']}")
+    etag = response.headers["etag"]
+    assert "last-modified" in response.headers
+
+    response = await client.get(
+        f"/products/{plant['id']}", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+
+async def test_weak_and_listed_tags_match(client):
+    plant = await create_plant(client)
+    etag = (await client.get(f"/products/{plant['id']}")).headers["etag"]
+
+    response = await client.get(
+        f"/products/{plant['id']}", headers={"If-None-Match": f'"other", W/{etag}'}
+    )
+    assert response.status_code == 304
+
+
+async def test_changed_product_is_sent_again(client):
+    plant = await create_plant(client)
+    etag = (await client.get(f"/products/{plant['id']}")).headers["etag"]
+    await client.put(f"/products/{plant['id']}", json={"stock": 9})
+
+    response = await client.get(
+        f"/products/{plant['id']}", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["stock"] == 9
+
+
+async def test_list_etag_changes_when_a_row_does(client):
+    first = await create_plant(client, name="Fern")
+    await create_plant(client, name="Orchid")
+    etag = (await client.get("/products/")).headers["etag"]
+
+    response = await client.get("/products/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    await client.put(f"/products/{first['id']}", json={"price": 99.0})
+    response = await client.get("/products/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+
+async def test_stale_if_match_returns_412(client):
+    plant = await create_plant(client)
+    etag = (await client.get(f"/products/{plant['id']}")).headers["etag"]
+
+    # Someone else updates the product first
+    response = await client.put(
+        f"/products/{plant['id']}", json={"price": 30.0}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 200
+    new_etag = response.headers["etag"]
+
+    response = await client.put(
+        f"/products/{plant['id']}", json={"price": 40.0}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 412
+    response = await client.delete(
+        f"/products/{plant['id']}", headers={"If-Match": etag}
+    )
+    assert response.status_code == 412
+
+    product = (await client.get(f"/products/{plant['id']}")).json()
+    assert product["price"] == 30.0
+
+    response = await client.delete(
+        f"/products/{plant['id']}", headers={"If-Match": new_etag}
+    )
+    assert response.status_code == 204
@@ -0,0 +1,24 @@
+import pytest
+
+from conftest import signup_and_login
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("path", ["/health/db-pool", "/health/password-hashing"])
+async def test_internal_metrics_require_auth(client, path):
+    assert (await client.get(path)).status_code == 401
+
+    headers = await signup_and_login(client)
+    response = await client.get(path, headers=headers)
+    assert response.status_code == 200
+    assert "metrics" in response.json()
+
+
+async def test_metrics_require_auth(client):
+    assert (await client.get("/metrics")).status_code == 401
+
+    headers = await signup_and_login(client)
+    response = await client.get("/metrics", headers=headers)
+    assert response.status_code == 200
+    assert "http_request_duration_seconds_bucket" in response.text
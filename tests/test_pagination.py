@@ -0,0 +1,44 @@
+import pytest
+
+from conftest import create_plant
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_cursor_walks_every_product_once(client):
+    created = {(await create_plant(client, name=f"Plant {i}"))["id"] for i in range(7)}
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get("/products/", params=params)
+        assert response.status_code == 200
+        seen += [product["id"] for product in response.json()]
+        pages += 1
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+
+    assert pages == 3
+    assert len(seen) == len(set(seen)) == 7
+    assert set(seen) == created
+
+
+async def test_rows_added_behind_the_cursor_are_not_repeated(client):
+    for i in range(4):
+        await create_plant(client, name=f"Plant {i}")
+
+    first = await client.get("/products/", params={"limit": 2})
+    cursor = first.headers["x-next-cursor"]
+    await create_plant(client, name="Plant late")
+
+    second = await client.get("/products/", params={"limit": 2, "cursor": cursor})
+    first_ids = {product["id"] for product in first.json()}
+    assert not first_ids & {product["id"] for product in second.json()}
+
+
+async def test_invalid_cursor_is_rejected(client):
+    response = await client.get("/products/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
@@ -0,0 +1,65 @@
+import pytest
+
+from app.crud.plantguide_crud import merge_patch, merge_patch_plant_guide
+from database import AsyncSessionLocal
+from conftest import create_plant
+
+pytestmark = pytest.mark.anyio
+
+MERGE_PATCH = {"Content-Type": "application/merge-patch+json"}
+
+
+def test_merge_patch_follows_rfc_7386():
+    target = {"water": "weekly", "feed": {"when": "spring", "what": "npk"}}
+    patch = {"water": None, "feed": {"what": "compost"}, "prune": "autumn"}
+    assert merge_patch(target, patch) == {
+        "feed": {"when": "spring", "what": "compost"},
+        "prune": "autumn",
+    }
+
+
+async def test_merge_patch_changes_only_the_sent_keys(client):
+    plant = await create_plant(client, guide=True)
+
+    response = await client.patch(
+        f"/plant-guides/{plant['id']}/care-guide",
+        json={"feed": None, "prune": "spring"},
+        headers=MERGE_PATCH,
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["care_guide"] == {"water": "weekly", "prune": "spring"}
+
+
+async def test_merge_patch_with_stale_if_match_returns_412(client):
+    plant = await create_plant(client, guide=True)
+    url = f"/plant-guides/{plant['id']}/care-guide"
+    etag = (await client.get(f"/plant-guides/{plant['id']}")).headers["etag"]
+
+    response = await client.patch(
+        url, json={"water": "daily"}, headers={**MERGE_PATCH, "If-Match": etag}
+    )
+    assert response.status_code == 200
+
+    response = await client.patch(
+        url, json={"water": "never"}, headers={**MERGE_PATCH, "If-Match": etag}
+    )
+    assert response.status_code == 412
+    guide = (await client.get(f"/plant-guides/{plant['id']}")).json()
+    assert guide["care_guide"]["water"] == "daily"
+
+
+async def test_expected_version_guards_the_update(client):
+    plant = await create_plant(client, guide=True)
+
+    async with AsyncSessionLocal() as db:
+        assert (
+            await merge_patch_plant_guide(
+                db, plant["id"], "care_guide", {"water": "daily"}, expected_version=7
+            )
+            is None
+        )
+        guide = await merge_patch_plant_guide(
+            db, plant["id"], "care_guide", {"water": "daily"}, expected_version=1
+        )
+    assert guide.version == 2
+    assert guide.care_guide["water"] == "daily"
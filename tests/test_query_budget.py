@@ -0,0 +1,80 @@
+import pytest
+from sqlalchemy import text
+
+from app.cache import catalog_cache
+from app.query_budget import QueryBudgetExceeded, assert_query_budget
+from database import AsyncSessionLocal
+from conftest import create_plant, signup_and_login
+
+pytestmark = pytest.mark.anyio
+
+# Pages hold several rows, so a query per row can't hide under the budget
+EXPAND_ALL = "plant,plant_guide,accessory"
+
+
+async def create_catalog(client):
+    plants = [
+        await create_plant(client, name=f"Plant {i}", stock=20, guide=True)
+        for i in range(5)
+    ]
+    response = await client.post(
+        "/products/accessory",
+        json={
+            "product": {"name": "Pot", "price": 8.0, "stock": 20, "type": "accessory"},
+            "accessory": {"size": "large", "color": "terracotta"},
+        },
+    )
+    assert response.status_code == 201, response.text
+    return plants + [response.json()]
+
+
+async def test_expanded_product_list_stays_within_budget(client):
+    await create_catalog(client)
+    catalog_cache.invalidate()
+
+    with assert_query_budget(4, "expanded product list"):
+        response = await client.get("/products/", params={"expand": EXPAND_ALL})
+    assert response.status_code == 200
+    assert len(response.json()) == 6
+
+
+async def test_expanded_product_detail_stays_within_budget(client):
+    plant = (await create_catalog(client))[0]
+    catalog_cache.invalidate()
+
+    with assert_query_budget(4, "expanded product detail"):
+        response = await client.get(
+            f"/products/{plant['id']}", params={"expand": EXPAND_ALL}
+        )
+    assert response.json()["plant"]["plant_guide"] is not None
+
+
+async def test_order_routes_stay_within_budget(client):
+    headers = await signup_and_login(client)
+    products = await create_catalog(client)
+    for n in range(3):
+        response = await client.post(
+            "/orders/checkout",
+            json={
+                "transac_id": f"txn-{n}",
+                "items": [{"product_id": p["id"], "quantity": 1} for p in products],
+            },
+            headers=headers,
+        )
+        assert response.status_code == 201, response.text
+
+    with assert_query_budget(3, "order history"):
+        response = await client.get("/orders/", headers=headers)
+    assert [len(order["items"]) for order in response.json()] == [6, 6, 6]
+
+    with assert_query_budget(2, "order summary"):
+        response = await client.get("/orders/summary", headers=headers)
+    assert response.json()["order_count"] == 3
+
+
+async def test_over_budget_block_fails():
+    with pytest.raises(QueryBudgetExceeded):
+        with assert_query_budget(1, "two statements"):
+            async with AsyncSessionLocal() as db:
+                await db.execute(text("SELECT 1"))
+                await db.execute(text("SELECT 2"))
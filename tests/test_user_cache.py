@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from app.cache import KeyedCache, SharedGeneration, TTLCache
+from app.crud.user_crud import update_user, user_cache
+from app.schemas.auth_schema import UserUpdate
+from database import AsyncSessionLocal
+from conftest import signup_and_login
+
+pytestmark = pytest.mark.anyio
+
+
+def other_worker_cache():
+    """A second cache over the same generation file, as another worker has"""
+    return KeyedCache(
+        TTLCache(maxsize=100, ttl=60),
+        SharedGeneration(os.environ["USER_CACHE_GENERATION_FILE"], slots=4096),
+    )
+
+
+async def test_update_invalidates_other_workers(client):
+    headers = await signup_and_login(client)
+    me = (await client.get("/auth/me", headers=headers)).json()
+
+    other = other_worker_cache()
+    other.set(me["id"], user_cache.get(me["id"]), other.generation(me["id"]))
+    assert other.get(me["id"]).name == "Gardener"
+
+    async with AsyncSessionLocal() as db:
+        await update_user(db, me["id"], UserUpdate(name="Renamed"))
+
+    assert other.get(me["id"]) is None
+    response = await client.get("/auth/me", headers=headers)
+    assert response.json()["name"] == "Renamed"
+
+
+async def test_deleted_user_token_is_rejected(client):
+    headers = await signup_and_login(client)
+    assert (await client.get("/auth/me", headers=headers)).status_code == 200
+
+    response = await client.delete("/auth/me", headers=headers)
+    assert response.status_code == 204
+    assert (await client.get("/auth/me", headers=headers)).status_code == 401
+
+
+async def test_cached_user_has_no_password_hash(client):
+    headers = await signup_and_login(client)
+    me = (await client.get("/auth/me", headers=headers)).json()
+
+    cached = user_cache.get(me["id"])
+    assert cached is not None
+    assert not hasattr(cached, "password")
+
+
+def test_load_racing_an_invalidation_is_not_served():
+    cache = other_worker_cache()
+    generation = cache.generation(7)
+    cache.invalidate(7)  # a write lands while the row is being loaded
+    cache.set(7, "stale", generation)
+    assert cache.get(7) is None